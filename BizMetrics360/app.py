@@ -12,6 +12,13 @@ import plotly.graph_objects as go
 import numpy as np
 from datetime import datetime, timedelta
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'python'))
+from schema import normalize_frame
+from kpi_calculator import KPICalculator
+from kpi_cache import frames_version
+from range_index import KPIRangeIndex
 
 # Page configuration
 st.set_page_config(
@@ -59,11 +66,14 @@ def generate_sample_data():
         'cost': revenue_data['revenue'] * np.random.uniform(0.3, 0.7, len(dates))
     })
     
+    # Marketing channel each sale is attributed to; drawn last so the series above keep their values
+    revenue_data['marketing_channel'] = np.random.choice(['Google Ads', 'Facebook', 'LinkedIn'], len(dates))
+    
     return {
-        'revenue': revenue_data,
-        'customers': customer_data,
-        'marketing': marketing_data,
-        'costs': cost_data
+        'revenue': normalize_frame(revenue_data),
+        'customers': normalize_frame(customer_data),
+        'marketing': normalize_frame(marketing_data),
+        'costs': normalize_frame(cost_data)
     }
 
 # KPI Calculations
@@ -74,10 +84,9 @@ def calculate_kpis(data):
     marketing_data = data['marketing']
     cost_data = data['costs']
     
-    # Revenue Growth Rate
-    revenue_data['date'] = pd.to_datetime(revenue_data['date'])
-    monthly_revenue = revenue_data.groupby(revenue_data['date'].dt.to_period('M'))['revenue'].sum()
-    revenue_growth = ((monthly_revenue.iloc[-1] - monthly_revenue.iloc[-2]) / monthly_revenue.iloc[-2] * 100) if len(monthly_revenue) > 1 else 0
+    # Revenue Growth Rate (the cached frame is left untouched)
+    growth = KPICalculator().calculate_growth_rates(revenue_data)
+    revenue_growth = growth['monthly']['growth_rate'] if growth else 0
     
     # CAC & CLV
     total_marketing_spend = marketing_data['spend'].sum()
@@ -117,13 +126,28 @@ def calculate_kpis(data):
         'total_customers': total_customers
     }
 
+# Additive KPIs that follow the sidebar date range; snapshot metrics such as retention keep the full history
+RANGE_KPIS = ('total_revenue', 'total_costs', 'gross_margin', 'total_marketing_spend', 'cac', 'cpc', 'conversion_rate')
+
+@st.cache_data
+def load_data():
+    # Hashed once per load; later reruns only compare the version string
+    data = generate_sample_data()
+    return data, frames_version(data)
+
+@st.cache_resource
+def build_range_index(_data, version):
+    # Shared by every session and rebuilt only when the data version changes;
+    # each date range afterwards is a prefix-sum lookup
+    return KPIRangeIndex.from_data(_data)
+
 # Main Dashboard
 def main():
     st.title('📊 BizMetrics360 - KPI Intelligence Platform')
     st.markdown('*Simplified Financial & Operational Metrics Dashboard*')
     
     # Load data
-    data = generate_sample_data()
+    data, data_version = load_data()
     kpis = calculate_kpis(data)
     
     # Sidebar filters
@@ -131,16 +155,26 @@ def main():
     
     # Date range filter
     st.sidebar.subheader('📅 Date Range')
+    range_index = build_range_index(data, data_version)
+    first_day, last_day = range_index.date_bounds()
     date_range = st.sidebar.date_input(
         'Select Date Range',
-        value=(datetime.now() - timedelta(days=30), datetime.now()),
-        max_value=datetime.now()
+        value=(first_day.date(), last_day.date()),
+        min_value=first_day.date(),
+        max_value=last_day.date()
     )
     
     # Region filter
     regions = ['All'] + list(data['revenue']['region'].unique())
     selected_region = st.sidebar.selectbox('🌍 Region', regions)
     
+    # Totals, margin and spend for the selected range; the picker returns one date until the end is chosen
+    selected_dates = list(date_range) if isinstance(date_range, (list, tuple)) else [date_range]
+    start_date, end_date = (selected_dates * 2)[:2] if selected_dates else (first_day, last_day)
+    range_kpis = range_index.kpis(start_date, end_date)
+    kpis.update({k: range_kpis[k] for k in RANGE_KPIS if k in range_kpis})
+    kpis['clv_cac_ratio'] = kpis['clv'] / kpis['cac'] if kpis['cac'] > 0 else 0
+    
     # Main KPI Cards
     st.markdown('---')
     st.subheader('📈 Key Performance Indicators')
@@ -214,11 +248,20 @@ def main():
     
     with col2:
         st.subheader('📈 Marketing ROI by Channel')
-        channel_roi = data['marketing'].groupby('channel')['spend'].sum().reset_index()
-        channel_roi['roi'] = np.random.uniform(2, 8, len(channel_roi))  # Sample ROI
-        fig_roi = px.bar(channel_roi, x='channel', y='roi', 
-                        title='Marketing ROI by Channel')
-        st.plotly_chart(fig_roi, use_container_width=True)
+        calculator = KPICalculator()
+        roi = calculator.calculate_roi_by_channel(data['marketing'], data['revenue'], revenue_channel='marketing_channel')
+        channel_roi = pd.DataFrame.from_dict(roi.get('channels', {}), orient='index').rename_axis('channel').reset_index()
+        if not channel_roi.empty:
+            fig_roi = px.bar(channel_roi, x='channel', y='roi', 
+                            title='Marketing ROI by Channel', labels={'roi': 'ROI %'})
+            st.plotly_chart(fig_roi, use_container_width=True)
+        
+        monthly_roi = calculator.calculate_monthly_roi_by_channel(data['marketing'], data['revenue'],
+                                                                   revenue_channel='marketing_channel')
+        if not monthly_roi.empty:
+            fig_monthly_roi = px.line(monthly_roi, x='month', y='roi', color='channel', markers=True,
+                                      title='Monthly ROI by Channel', labels={'roi': 'ROI %'})
+            st.plotly_chart(fig_monthly_roi, use_container_width=True)
     
     # Detailed Metrics Table
     st.markdown('---')
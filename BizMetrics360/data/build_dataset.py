@@ -0,0 +1,198 @@
+"""
+BizMetrics360 - Load Test Dataset Builder
+Builds revenue/customers/marketing/costs datasets at production scale as
+month-partitioned Parquet files plus a SQLite database using the
+DatabaseManager schema.
+
+Every (table, month) partition draws from its own SeedSequence-spawned
+stream, so the output is identical whatever the number of workers.
+An existing SQLite database or Parquet output is only replaced when
+--overwrite is given.
+
+Example:
+    python data/build_dataset.py --revenue-rows 50000000 --customers 2000000
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'python'))
+from data_processor import DataProcessor
+from database_manager import DatabaseManager
+
+TABLES = ['revenue', 'customers', 'marketing', 'costs']
+SQLITE_SUFFIXES = ['', '-wal', '-shm', '-journal']
+
+
+def split_rows(total, parts):
+    """Split total rows as evenly as possible across parts"""
+    base, remainder = divmod(total, parts)
+    return [base + (1 if i < remainder else 0) for i in range(parts)]
+
+
+def plan_partitions(args):
+    """Build one task per (table, month) with its own seed stream"""
+    months = pd.period_range(start=args.start, periods=args.months, freq='M')
+    seeds = np.random.SeedSequence(args.seed).spawn(len(TABLES) * len(months))
+
+    revenue_rows = split_rows(args.revenue_rows, len(months))
+    customer_rows = split_rows(args.customers, len(months))
+    customer_start_ids = np.concatenate([[0], np.cumsum(customer_rows)[:-1]])
+
+    tasks = []
+    for t, table in enumerate(TABLES):
+        for k, month in enumerate(months):
+            task = {
+                'table': table,
+                'month': month.strftime('%Y-%m'),
+                'month_index': k,
+                'seed': seeds[t * len(months) + k],
+                'output_dir': args.output_dir
+            }
+            if table == 'revenue':
+                task['rows'] = revenue_rows[k]
+            elif table == 'customers':
+                task['rows'] = customer_rows[k]
+                task['start_id'] = int(customer_start_ids[k])
+            elif table == 'marketing':
+                task['rows'] = args.marketing_rows_per_channel
+            else:
+                task['rows'] = args.cost_rows_per_category
+            tasks.append(task)
+    return tasks
+
+
+def partition_path(output_dir, table, month):
+    """Hive-style month partition path for a table"""
+    return os.path.join(output_dir, table, f'period={month}', 'part-0.parquet')
+
+
+def build_partition(task):
+    """Generate one (table, month) partition and write it as Parquet"""
+    rng = np.random.default_rng(task['seed'])
+    processor = DataProcessor()
+    month_start = f"{task['month']}-01"
+
+    if task['table'] == 'revenue':
+        df = processor.generate_sample_revenue_data(
+            months=1, rows_per_month=task['rows'], start=month_start,
+            base_revenue=100000 * 1.05 ** task['month_index'], rng=rng
+        )
+    elif task['table'] == 'customers':
+        df = processor.generate_sample_customer_data(
+            num_customers=task['rows'], start_id=task['start_id'],
+            cohort_months=[task['month']], rng=rng
+        )
+    elif task['table'] == 'marketing':
+        df = processor.generate_sample_marketing_data(
+            months=1, rows_per_channel=task['rows'], start=task['month'], rng=rng
+        )
+    else:
+        df = processor.generate_sample_cost_data(
+            months=1, rows_per_category=task['rows'], start=month_start, rng=rng
+        )
+
+    path = partition_path(task['output_dir'], task['table'], task['month'])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_parquet(path, index=False)
+    return task['table'], task['month'], len(df)
+
+
+def existing_partitions(output_dir):
+    """Table directories under output_dir that already hold files"""
+    return [
+        os.path.join(output_dir, table) for table in TABLES
+        if any(files for _, _, files in os.walk(os.path.join(output_dir, table)))
+    ]
+
+
+def remove_database(db_path):
+    """Delete a SQLite database together with its WAL/journal files"""
+    for suffix in SQLITE_SUFFIXES:
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+
+def load_into_sqlite(tasks, db_path):
+    """Stream the written partitions into SQLite using the DatabaseManager schema"""
+    db = DatabaseManager(db_path)
+    for table in TABLES:
+        partitions = (
+            pd.read_parquet(partition_path(task['output_dir'], task['table'], task['month']))
+            for task in tasks if task['table'] == table
+        )
+        stats = db.bulk_insert(table, partitions, defer_indexes=True, defer_rollups=True)
+        print(f"   - {table}: {stats['rows']:,} rows at {stats['rows_per_sec']:,.0f} rows/sec")
+    db.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Build a partitioned BizMetrics360 load-test dataset')
+    parser.add_argument('--output-dir', default=os.path.join('data', 'load_test'),
+                        help='Directory for the Parquet partitions and SQLite database')
+    parser.add_argument('--start', default='2022-01', help='First month (YYYY-MM)')
+    parser.add_argument('--months', type=int, default=24, help='Number of month partitions')
+    parser.add_argument('--revenue-rows', type=int, default=1_000_000, help='Total revenue rows')
+    parser.add_argument('--customers', type=int, default=100_000, help='Total customers')
+    parser.add_argument('--marketing-rows-per-channel', type=int, default=1,
+                        help='Marketing rows per channel per month')
+    parser.add_argument('--cost-rows-per-category', type=int, default=1,
+                        help='Cost rows per category per month')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes')
+    parser.add_argument('--seed', type=int, default=42, help='Root seed')
+    parser.add_argument('--sqlite', default=None,
+                        help='SQLite database path (default: <output-dir>/bizmetrics360.db)')
+    parser.add_argument('--schema-only', action='store_true',
+                        help='Create the SQLite schema without loading the generated rows')
+    parser.add_argument('--overwrite', action='store_true',
+                        help='Replace an existing SQLite database instead of refusing to run')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    db_path = args.sqlite or os.path.join(args.output_dir, 'bizmetrics360.db')
+    # Loading appends, so a rerun into the same database would duplicate every row, and
+    # partitions left by a build with other months would be read alongside the new ones
+    stale = existing_partitions(args.output_dir)
+    if not args.overwrite:
+        if os.path.exists(db_path):
+            sys.exit(f"❌ SQLite database '{db_path}' already exists; pass --overwrite to rebuild it")
+        if stale:
+            sys.exit(f"❌ Parquet output already exists in '{args.output_dir}'; pass --overwrite to rebuild it")
+    for table_dir in stale:
+        shutil.rmtree(table_dir)
+    tasks = plan_partitions(args)
+
+    print(f"🏗️  Building {len(tasks)} partitions with {args.workers} workers...")
+    started = time.perf_counter()
+    row_counts = dict.fromkeys(TABLES, 0)
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(build_partition, task) for task in tasks]
+        for future in as_completed(futures):
+            table, month, rows = future.result()
+            row_counts[table] += rows
+    print(f"✅ Partitions written to '{args.output_dir}' in {time.perf_counter() - started:.1f}s")
+    for table in TABLES:
+        print(f"   - {table}: {row_counts[table]:,} rows")
+
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    remove_database(db_path)
+    if args.schema_only:
+        DatabaseManager(db_path)
+        print(f"✅ SQLite schema created at '{db_path}'")
+    else:
+        started = time.perf_counter()
+        load_into_sqlite(tasks, db_path)
+        print(f"✅ SQLite database loaded at '{db_path}' in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
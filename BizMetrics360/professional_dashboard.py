@@ -11,6 +11,14 @@ import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
 from datetime import datetime, timedelta
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'python'))
+from schema import normalize_frame
+from kpi_calculator import KPICalculator
+from kpi_cache import frames_version
+from range_index import KPIRangeIndex
 
 # ---- Page configuration (must be first) ----
 st.set_page_config(
@@ -245,7 +253,15 @@ def generate_enterprise_data():
         'department': np.random.choice(['Sales', 'Marketing', 'Engineering', 'Support', 'Finance'], len(dates))
     })
 
-    return {'revenue': revenue_data, 'customers': customer_data, 'marketing': marketing_data, 'costs': cost_data}
+    # Marketing channel each sale is attributed to; drawn last so the series above keep their values
+    revenue_data['marketing_channel'] = np.random.choice(
+        ['Google Ads', 'LinkedIn', 'Facebook', 'Trade Shows', 'Content Marketing'], len(dates)
+    )
+
+    return {
+        'revenue': normalize_frame(revenue_data), 'customers': normalize_frame(customer_data),
+        'marketing': normalize_frame(marketing_data), 'costs': normalize_frame(cost_data)
+    }
 
 # ============================== KPI Calculations ==============================
 def calculate_enterprise_kpis(data):
@@ -254,14 +270,10 @@ def calculate_enterprise_kpis(data):
     marketing_data = data['marketing']
     cost_data = data['costs']
 
-    revenue_data['date'] = pd.to_datetime(revenue_data['date'])
-    monthly_revenue = revenue_data.groupby(revenue_data['date'].dt.to_period('M'))['revenue'].sum()
-
-    if len(monthly_revenue) > 1:
-        mom_growth = ((monthly_revenue.iloc[-1] - monthly_revenue.iloc[-2]) / monthly_revenue.iloc[-2] * 100)
-        yoy_growth = ((monthly_revenue.iloc[-1] - monthly_revenue.iloc[-13]) / monthly_revenue.iloc[-13] * 100) if len(monthly_revenue) > 12 else 0
-    else:
-        mom_growth = yoy_growth = 0
+    # Growth without writing back into the cached frame; YoY compares with the same month a year earlier
+    growth = KPICalculator().calculate_growth_rates(revenue_data)
+    mom_growth = growth['monthly']['growth_rate'] if growth else 0
+    yoy_growth = growth['monthly']['yoy_growth'] if growth else 0
 
     total_marketing_spend = marketing_data['spend'].sum()
     new_customers = int((customer_data['is_new_customer'] == True).sum())
@@ -301,6 +313,21 @@ def calculate_enterprise_kpis(data):
         'total_marketing_spend': total_marketing_spend
     }
 
+# Additive KPIs that follow the sidebar date range; snapshot metrics such as retention keep the full history
+RANGE_KPIS = ('total_revenue', 'total_costs', 'gross_margin', 'total_marketing_spend', 'cac', 'cpc', 'conversion_rate')
+
+@st.cache_data
+def load_data():
+    # Hashed once per load; later reruns only compare the version string
+    data = generate_enterprise_data()
+    return data, frames_version(data)
+
+@st.cache_resource
+def build_range_index(_data, version):
+    # Shared by every session and rebuilt only when the data version changes;
+    # each analysis period afterwards is a prefix-sum lookup
+    return KPIRangeIndex.from_data(_data)
+
 # ============================== UI Helpers ==============================
 def render_header():
     st.markdown("""
@@ -347,23 +374,34 @@ def style_plotly(fig, height=400):
 def main():
     render_header()
 
-    data = generate_enterprise_data()
+    data, data_version = load_data()
     kpis = calculate_enterprise_kpis(data)
 
     # Sidebar controls
     st.sidebar.markdown("## 🎛️ Dashboard Controls")
     st.sidebar.markdown("---")
     st.sidebar.markdown("### 📅 Select Analysis Period")
-    st.sidebar.date_input(
+    range_index = build_range_index(data, data_version)
+    first_day, last_day = range_index.date_bounds()
+    analysis_period = st.sidebar.date_input(
         'Select Analysis Period',
-        value=(datetime.now() - timedelta(days=90), datetime.now()),
-        max_value=datetime.now()
+        value=(first_day.date(), last_day.date()),
+        min_value=first_day.date(),
+        max_value=last_day.date()
     )
     regions = ['Global'] + list(data['revenue']['region'].unique())
     selected_region = st.sidebar.selectbox('🌍 Region', regions)
     company_sizes = ['All Sizes'] + list(data['customers']['company_size'].unique())
     selected_size = st.sidebar.selectbox('🏢 Company Size', company_sizes)
 
+    # Additive KPIs for the selected period; the picker returns one date until the end is chosen
+    selected_dates = list(analysis_period) if isinstance(analysis_period, (list, tuple)) else [analysis_period]
+    start_date, end_date = (selected_dates * 2)[:2] if selected_dates else (first_day, last_day)
+    range_kpis = range_index.kpis(start_date, end_date)
+    kpis.update({k: range_kpis[k] for k in RANGE_KPIS if k in range_kpis})
+    kpis['clv_cac_ratio'] = kpis['clv'] / kpis['cac'] if kpis['cac'] > 0 else 0
+    kpis['net_margin'] = kpis['gross_margin'] - 15  # simplified
+
     # Tabs
     tab1, tab2, tab3, tab4 = st.tabs(["📊 Executive Summary", "💰 Financial Metrics", "👥 Customer Analytics", "📈 Marketing Performance"])
 
@@ -434,10 +472,20 @@ def main():
             render_metric_card("Marketing ROI", (kpis['clv_cac_ratio'] - 1) * 100, None, "percentage")
 
         st.markdown("### 📊 Marketing ROI by Channel")
-        channel_perf = data['marketing'].groupby('channel').agg({'spend': 'sum', 'conversions': 'sum', 'clicks': 'sum'}).reset_index()
-        channel_perf['roi'] = np.random.uniform(2, 8, len(channel_perf))
-        fig_channels = px.bar(channel_perf, x='channel', y='roi', title='Marketing ROI by Channel', template='plotly_white')
-        st.plotly_chart(style_plotly(fig_channels), use_container_width=True)
+        calculator = KPICalculator()
+        roi = calculator.calculate_roi_by_channel(data['marketing'], data['revenue'], revenue_channel='marketing_channel')
+        channel_perf = pd.DataFrame.from_dict(roi.get('channels', {}), orient='index').rename_axis('channel').reset_index()
+        if not channel_perf.empty:
+            fig_channels = px.bar(channel_perf, x='channel', y='roi', title='Marketing ROI by Channel',
+                                  labels={'roi': 'ROI %'}, template='plotly_white')
+            st.plotly_chart(style_plotly(fig_channels), use_container_width=True)
+
+        monthly_roi = calculator.calculate_monthly_roi_by_channel(data['marketing'], data['revenue'],
+                                                                   revenue_channel='marketing_channel')
+        if not monthly_roi.empty:
+            fig_monthly_roi = px.line(monthly_roi, x='month', y='roi', color='channel', markers=True,
+                                      title='Monthly ROI by Channel', labels={'roi': 'ROI %'}, template='plotly_white')
+            st.plotly_chart(style_plotly(fig_monthly_roi), use_container_width=True)
 
     # Footer
     st.markdown("---")
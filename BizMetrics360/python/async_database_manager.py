@@ -0,0 +1,104 @@
+# BizMetrics360 - Async Database Access
+import asyncio
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional
+import pandas as pd
+from database_manager import DatabaseManager
+
+
+class AsyncDatabaseManager:
+    """asyncio facade over DatabaseManager.
+
+    Queries run on a bounded thread pool. Each worker thread gets its own
+    pooled read connection, so independent queries run side by side and a
+    batch costs roughly as much as its slowest query.
+    """
+
+    def __init__(self, db_manager: Optional[DatabaseManager] = None, db_path: str = 'bizmetrics360.db',
+                 max_workers: int = 4, timeout: Optional[float] = None):
+        self.logger = logging.getLogger(__name__)
+        self._owns_db = db_manager is None
+        self.db = db_manager or DatabaseManager(db_path)
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bizmetrics360-db')
+
+    async def run(self, func: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        # Runs func on the pool; on timeout or cancellation the query in flight is interrupted
+        loop = asyncio.get_running_loop()
+        lock = threading.Lock()
+        running = {}
+
+        def call():
+            with lock:
+                running['ident'] = threading.get_ident()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with lock:
+                    running.pop('ident', None)
+
+        future = loop.run_in_executor(self.executor, call)
+        try:
+            return await asyncio.wait_for(future, timeout if timeout is not None else self.timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            # A queued call is dropped by the cancel; a running one only stops if interrupted
+            with lock:
+                if 'ident' in running:
+                    self.db.pool.interrupt_reader(running['ident'])
+            raise
+
+    async def _gather(self, calls: Dict[str, Awaitable]) -> Dict[str, object]:
+        tasks = {name: asyncio.ensure_future(call) for name, call in calls.items()}
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            # gather leaves the other queries running when one fails; stop them too
+            for task in tasks.values():
+                task.cancel()
+            raise
+        return {name: task.result() for name, task in tasks.items()}
+
+    async def get_revenue_data(self, *args, timeout: Optional[float] = None, **kwargs) -> pd.DataFrame:
+        return await self.run(self.db.get_revenue_data, *args, timeout=timeout, **kwargs)
+
+    async def get_customer_data(self, *args, timeout: Optional[float] = None, **kwargs) -> pd.DataFrame:
+        return await self.run(self.db.get_customer_data, *args, timeout=timeout, **kwargs)
+
+    async def get_marketing_data(self, *args, timeout: Optional[float] = None, **kwargs) -> pd.DataFrame:
+        return await self.run(self.db.get_marketing_data, *args, timeout=timeout, **kwargs)
+
+    async def get_cost_data(self, *args, timeout: Optional[float] = None, **kwargs) -> pd.DataFrame:
+        return await self.run(self.db.get_cost_data, *args, timeout=timeout, **kwargs)
+
+    async def get_all_data(self, start_date=None, end_date=None, regions: Optional[List[str]] = None,
+                           timeout: Optional[float] = None) -> Dict[str, pd.DataFrame]:
+        return await self._gather({
+            'revenue': self.get_revenue_data(start_date, end_date, regions, timeout=timeout),
+            'customers': self.get_customer_data(start_date, end_date, regions, timeout=timeout),
+            'marketing': self.get_marketing_data(start_date, end_date, timeout=timeout),
+            'costs': self.get_cost_data(start_date, end_date, timeout=timeout)
+        })
+
+    async def get_kpi_aggregates(self, start_date=None, end_date=None, regions: Optional[List[str]] = None,
+                                 timeout: Optional[float] = None) -> Dict[str, pd.DataFrame]:
+        return await self._gather({
+            'monthly_revenue': self.run(self.db.get_revenue_aggregates, start_date, end_date, regions,
+                                        timeout=timeout),
+            'customer_summary': self.run(self.db.get_customer_aggregates, start_date, end_date, regions,
+                                         timeout=timeout),
+            'channel_spend': self.run(self.db.get_marketing_aggregates, start_date, end_date, timeout=timeout),
+            'cost_totals': self.run(self.db.get_cost_aggregates, start_date, end_date, timeout=timeout)
+        })
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        if self._owns_db:
+            self.db.close()
+
+    async def __aenter__(self) -> 'AsyncDatabaseManager':
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
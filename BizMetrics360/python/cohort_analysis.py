@@ -0,0 +1,169 @@
+# BizMetrics360 - Cohort Analysis
+import logging
+import pandas as pd
+import numpy as np
+from typing import Dict, List, Optional
+from kpi_accumulator import month_codes
+
+# Average month length, used to turn customer_lifespan_days into whole periods
+DAYS_PER_PERIOD = 365.25 / 12
+
+COHORT_COLUMNS = ['cohort_month', 'signup_date']
+
+
+class CohortEngine:
+    """Cohort x period-offset retention and revenue matrices.
+
+    Customers only carry a cohort (cohort_month or signup_date) and a
+    lifespan, so a customer counts as retained for the first
+    lifespan_days / DAYS_PER_PERIOD periods after signup; customers that have
+    not churned stay retained up to as_of. Each customer's total_spent is
+    spread evenly over the periods they were retained.
+
+    State is kept per cohort as histograms over lifespan, which are additive:
+    add() only touches the cohorts present in the new rows, and the
+    per-cohort rows derived from them (a reverse cumulative sum) are cached
+    until that cohort changes again.
+    """
+
+    def __init__(self, max_periods: Optional[int] = None):
+        self.logger = logging.getLogger(__name__)
+        self.max_periods = max_periods
+        self._sizes: Dict[np.datetime64, int] = {}
+        self._active: Dict[np.datetime64, int] = {}
+        self._churned_hist: Dict[np.datetime64, np.ndarray] = {}
+        self._revenue_hist: Dict[np.datetime64, np.ndarray] = {}
+        self._rows: Dict[np.datetime64, tuple] = {}
+
+    @classmethod
+    def from_customers(cls, customer_data: pd.DataFrame, max_periods: Optional[int] = None) -> 'CohortEngine':
+        engine = cls(max_periods)
+        engine.add(customer_data)
+        return engine
+
+    def _add_hist(self, store: Dict[np.datetime64, np.ndarray], cohort: np.datetime64, hist: np.ndarray):
+        current = store.get(cohort)
+        if current is None:
+            store[cohort] = hist
+            return
+        if len(current) < len(hist):
+            current = np.pad(current, (0, len(hist) - len(current)))
+        current[:len(hist)] += hist
+        store[cohort] = current
+
+    def add(self, customer_data: pd.DataFrame) -> List[str]:
+        # Folds new customers (e.g. this month's signups) into their cohorts; returns the cohorts touched
+        column = next((c for c in COHORT_COLUMNS if c in customer_data.columns), None)
+        if column is None:
+            raise ValueError(f'Customer data needs one of {COHORT_COLUMNS}')
+        codes, cohorts = month_codes(customer_data[column])
+        known = codes >= 0
+
+        lifespan_days = np.nan_to_num(customer_data['customer_lifespan_days'].to_numpy(dtype=np.float64))
+        periods = np.floor(lifespan_days / DAYS_PER_PERIOD).astype(np.int64)
+        if self.max_periods is not None:
+            periods = np.minimum(periods, self.max_periods)
+        if 'churned' in customer_data.columns:
+            churned = (customer_data['churned'] == True).to_numpy()
+        elif 'is_active' in customer_data.columns:
+            churned = (customer_data['is_active'] != True).to_numpy()
+        else:
+            churned = np.ones(len(customer_data), dtype=bool)
+        spent = (np.nan_to_num(customer_data['total_spent'].to_numpy(dtype=np.float64))
+                 if 'total_spent' in customer_data.columns else np.zeros(len(customer_data)))
+
+        codes, periods, churned, spent = codes[known], periods[known], churned[known], spent[known]
+        width = int(periods.max()) + 1 if len(periods) else 1
+        # One flat bincount per measure over (cohort, lifespan in periods)
+        flat = codes * width + periods
+        size = len(cohorts) * width
+        sizes = np.bincount(codes, minlength=len(cohorts))
+        active = np.bincount(codes[~churned], minlength=len(cohorts))
+        churned_hist = np.bincount(flat[churned], minlength=size).reshape(len(cohorts), width)
+        revenue_hist = np.bincount(flat, weights=spent / (periods + 1), minlength=size).reshape(len(cohorts), width)
+
+        touched = []
+        for index, cohort in enumerate(cohorts):
+            if sizes[index] == 0:
+                continue
+            self._sizes[cohort] = self._sizes.get(cohort, 0) + int(sizes[index])
+            self._active[cohort] = self._active.get(cohort, 0) + int(active[index])
+            self._add_hist(self._churned_hist, cohort, churned_hist[index])
+            self._add_hist(self._revenue_hist, cohort, revenue_hist[index])
+            self._rows.pop(cohort, None)
+            touched.append(str(cohort))
+        return touched
+
+    def invalidate(self, cohorts: Optional[List[str]] = None):
+        if cohorts is None:
+            self._rows.clear()
+            return
+        for cohort in cohorts:
+            self._rows.pop(np.datetime64(cohort, 'M'), None)
+
+    @property
+    def cohorts(self) -> List[str]:
+        return [str(cohort) for cohort in sorted(self._sizes)]
+
+    def _cohort_row(self, cohort: np.datetime64) -> tuple:
+        # Churned customers retained at offset k are those with lifespan >= k: a reverse cumsum
+        if cohort not in self._rows:
+            churned = self._churned_hist[cohort][::-1].cumsum()[::-1]
+            revenue = self._revenue_hist[cohort][::-1].cumsum()[::-1]
+            self._rows[cohort] = (churned, revenue)
+        return self._rows[cohort]
+
+    def _default_as_of(self) -> np.datetime64:
+        # The last period any customer is observed in
+        return max(cohort + (len(self._churned_hist[cohort]) - 1) for cohort in self._sizes)
+
+    def _matrices(self, as_of=None):
+        cohorts = np.array(sorted(self._sizes), dtype='datetime64[M]')
+        windows = np.zeros(0, dtype=np.int64)
+        if len(cohorts):
+            as_of = self._default_as_of() if as_of is None else np.datetime64(pd.Timestamp(as_of), 'M')
+            cohorts = cohorts[cohorts <= as_of]
+            windows = (as_of - cohorts).astype(np.int64)
+        if self.max_periods is not None:
+            windows = np.minimum(windows, self.max_periods)
+        width = int(windows.max()) + 1 if len(windows) else 0
+
+        retained = np.zeros((len(cohorts), width))
+        revenue = np.zeros((len(cohorts), width))
+        for index, cohort in enumerate(cohorts):
+            churned_row, revenue_row = self._cohort_row(cohort)
+            span = min(len(churned_row), width)
+            retained[index, :span] = churned_row[:span]
+            revenue[index, :span] = revenue_row[:span]
+        offsets = np.arange(width)
+        observed = offsets[None, :] <= windows[:, None]
+        retained += np.array([self._active[c] for c in cohorts])[:, None] * observed
+        sizes = np.array([self._sizes[c] for c in cohorts], dtype=np.float64)
+        labels = [str(cohort) for cohort in cohorts]
+        return labels, sizes, retained, revenue, observed
+
+    def retention_matrix(self, as_of=None) -> pd.DataFrame:
+        # Share of each cohort retained per period offset; NaN where the period is after as_of
+        labels, sizes, retained, _, observed = self._matrices(as_of)
+        rates = np.where(observed, retained / sizes[:, None] * 100, np.nan)
+        return pd.DataFrame(rates, index=pd.Index(labels, name='cohort'),
+                            columns=pd.RangeIndex(rates.shape[1], name='period'))
+
+    def revenue_matrix(self, as_of=None) -> pd.DataFrame:
+        labels, _, _, revenue, observed = self._matrices(as_of)
+        values = np.where(observed, revenue, np.nan)
+        return pd.DataFrame(values, index=pd.Index(labels, name='cohort'),
+                            columns=pd.RangeIndex(values.shape[1], name='period'))
+
+    def to_long(self, as_of=None) -> pd.DataFrame:
+        # Sparse form: one row per observed cell with retained customers, for many cohorts
+        labels, sizes, retained, revenue, observed = self._matrices(as_of)
+        rows, offsets = np.nonzero(observed & (retained > 0))
+        return pd.DataFrame({
+            'cohort': np.asarray(labels, dtype=object)[rows],
+            'period': offsets,
+            'cohort_size': sizes[rows].astype(np.int64),
+            'retained': retained[rows, offsets].astype(np.int64),
+            'retention_rate': retained[rows, offsets] / sizes[rows] * 100,
+            'revenue': revenue[rows, offsets]
+        })
@@ -0,0 +1,102 @@
+# BizMetrics360 - SQLite Connection Pool
+import sqlite3
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -65536,       # negative values are KiB, i.e. 64 MB page cache
+    'mmap_size': 268435456,     # 256 MB memory-mapped I/O
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000
+}
+
+
+class ConnectionPool:
+    """Thread-local reader connections plus a single serialized writer.
+
+    With WAL journaling, readers on other threads keep seeing the last
+    committed snapshot while the writer is ingesting.
+    """
+
+    def __init__(self, db_path: str, pragmas: Optional[Dict[str, object]] = None):
+        self.db_path = db_path
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+        self.logger = logging.getLogger(__name__)
+
+        # Every connection to ':memory:' is a separate database, so readers share the writer
+        self._shared = db_path == ':memory:'
+        self._local = threading.local()
+        self._readers: Dict[int, sqlite3.Connection] = {}
+        self._readers_lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_lock = threading.RLock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _get_writer(self) -> sqlite3.Connection:
+        if self._writer is None:
+            self._writer = self._connect()
+        return self._writer
+
+    def _prune_dead_readers(self):
+        alive = {thread.ident for thread in threading.enumerate()}
+        for ident in [ident for ident in self._readers if ident not in alive]:
+            self._readers.pop(ident).close()
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        if self._shared:
+            with self._writer_lock:
+                yield self._get_writer()
+            return
+
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            conn.execute('PRAGMA query_only = ON')
+            self._local.conn = conn
+            with self._readers_lock:
+                self._prune_dead_readers()
+                self._readers[threading.get_ident()] = conn
+        yield conn
+
+    def interrupt_reader(self, thread_ident: int) -> bool:
+        # Aborts the statement running on that thread's reader; it fails with 'interrupted'
+        if self._shared:
+            return False
+        with self._readers_lock:
+            conn = self._readers.get(thread_ident)
+        if conn is None:
+            return False
+        conn.interrupt()
+        return True
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        with self._writer_lock:
+            conn = self._get_writer()
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def close(self):
+        with self._readers_lock:
+            for conn in self._readers.values():
+                conn.close()
+            self._readers.clear()
+        self._local = threading.local()
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
@@ -0,0 +1,247 @@
+# BizMetrics360 - Mergeable KPI Accumulator
+import pandas as pd
+import numpy as np
+import logging
+from typing import Dict, List, Optional, Tuple
+
+CUSTOMER_FLAGS = {
+    'active_customers': 'is_active',
+    'churned_customers': 'churned',
+    'new_customers': 'is_new_customer'
+}
+CUSTOMER_MEASURES = ['total_spent', 'purchase_count', 'customer_lifespan_days']
+
+
+def to_month(values) -> np.ndarray:
+    # Parse each distinct value once; dates repeat heavily in fact tables
+    codes, uniques = pd.factorize(pd.Series(values))
+    months = pd.to_datetime(pd.Series(uniques)).values.astype('datetime64[M]')
+    return np.append(months, np.datetime64('NaT', 'M'))[codes]
+
+
+def to_day(values) -> np.ndarray:
+    # Same as to_month at day resolution
+    codes, uniques = pd.factorize(pd.Series(values))
+    days = pd.to_datetime(pd.Series(uniques)).values.astype('datetime64[D]')
+    return np.append(days, np.datetime64('NaT', 'D'))[codes]
+
+
+def month_labels(months: pd.Index) -> List[str]:
+    return [str(month) for month in months.values.astype('datetime64[M]')]
+
+
+def month_codes(values) -> Tuple[np.ndarray, np.ndarray]:
+    # (codes, months) like pd.factorize, but keyed on the month; -1 marks missing dates
+    codes, uniques = pd.factorize(pd.Series(values))
+    months = pd.to_datetime(pd.Series(uniques)).values.astype('datetime64[M]')
+    distinct, inverse = np.unique(months, return_inverse=True)
+    return np.append(inverse, -1)[codes], distinct
+
+
+def dimension_codes(values: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories.to_numpy()
+    codes, uniques = pd.factorize(values)
+    return codes, np.asarray(uniques)
+
+
+def group_sums(keys: List[Tuple[np.ndarray, np.ndarray]], values: pd.Series,
+               names: Tuple[str, str], index_names: Optional[List[str]] = None) -> pd.DataFrame:
+    """Sum and non-null count of values per observed key combination.
+
+    keys are (codes, uniques) pairs; the codes are folded into one flat id and
+    reduced with np.bincount, which is much cheaper than a multi-key groupby.
+    index_names names the index levels, one per key.
+    """
+    flat = np.zeros(len(values), dtype=np.int64)
+    valid = np.ones(len(values), dtype=bool)
+    size = 1
+    for codes, uniques in keys:
+        flat = flat * len(uniques) + codes
+        valid &= codes >= 0
+        size *= len(uniques)
+
+    measure = values.to_numpy(dtype=np.float64)
+    present = valid & ~np.isnan(measure)
+    occurrences = np.bincount(flat[valid], minlength=size)
+    sums = np.bincount(flat[present], weights=measure[present], minlength=size)
+    counts = np.bincount(flat[present], minlength=size)
+
+    observed = np.flatnonzero(occurrences)
+    levels = []
+    remainder = observed
+    for codes, uniques in reversed(keys):
+        remainder, level = np.divmod(remainder, len(uniques))
+        levels.append(uniques[level])
+    levels.reverse()
+    levels[0] = pd.DatetimeIndex(levels[0].astype('datetime64[ns]'))
+    index = (levels[0].rename(index_names[0] if index_names else None) if len(levels) == 1
+             else pd.MultiIndex.from_arrays(levels, names=index_names))
+    return pd.DataFrame({names[0]: sums[observed], names[1]: counts[observed].astype(float)}, index=index)
+
+
+class KPIAccumulator:
+    """Partial KPI state folded from table chunks.
+
+    Holds only sums and counts keyed by month/channel/category, so memory is
+    independent of table size and two accumulators over disjoint rows can be
+    merged with merge().
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.tables = set()
+        for table in ('revenue', 'customers', 'marketing', 'costs'):
+            self.reset(table)
+
+    def reset(self, table: str):
+        self.tables.discard(table)
+        if table == 'revenue':
+            self.monthly_revenue = pd.DataFrame(columns=['revenue', 'row_count'], dtype=float,
+                                                index=pd.DatetimeIndex([], name='month'))
+            self.channel_revenue = pd.Series(dtype=float)
+        elif table == 'marketing':
+            self.channel_spend = pd.DataFrame(columns=['spend', 'row_count'], dtype=float,
+                                              index=pd.MultiIndex.from_arrays([pd.DatetimeIndex([]), []],
+                                                                              names=['month', 'channel']))
+        elif table == 'costs':
+            self.cost_totals = pd.DataFrame(columns=['cost', 'row_count'], dtype=float,
+                                            index=pd.MultiIndex.from_arrays([pd.DatetimeIndex([]), []],
+                                                                            names=['month', 'category']))
+        elif table == 'customers':
+            self.customer_totals = dict.fromkeys(
+                ['total_customers', *CUSTOMER_FLAGS]
+                + [f'{m}_sum' for m in CUSTOMER_MEASURES]
+                + [f'{m}_count' for m in CUSTOMER_MEASURES],
+                0
+            )
+        else:
+            raise ValueError(f'Unknown table: {table}')
+
+    def _add_frame(self, current: pd.DataFrame, update: pd.DataFrame) -> pd.DataFrame:
+        if current.empty:
+            return update
+        return current.add(update, fill_value=0)
+
+    def add_revenue(self, chunk: pd.DataFrame):
+        self.tables.add('revenue')
+        grouped = group_sums([month_codes(chunk['date'])], chunk['revenue'], ('revenue', 'row_count'), ['month'])
+        self.monthly_revenue = self._add_frame(self.monthly_revenue, grouped)
+        if 'channel' in chunk.columns:
+            self.channel_revenue = self.channel_revenue.add(
+                chunk.groupby('channel', observed=True)['revenue'].sum(), fill_value=0
+            )
+
+    def add_marketing(self, chunk: pd.DataFrame):
+        self.tables.add('marketing')
+        month_column = 'month' if 'month' in chunk.columns else 'date'
+        grouped = group_sums([month_codes(chunk[month_column]), dimension_codes(chunk['channel'])],
+                             chunk['spend'], ('spend', 'row_count'), ['month', 'channel'])
+        self.channel_spend = self._add_frame(self.channel_spend, grouped)
+
+    def add_costs(self, chunk: pd.DataFrame):
+        self.tables.add('costs')
+        category = chunk['category'] if 'category' in chunk.columns else pd.Series('', index=chunk.index)
+        grouped = group_sums([month_codes(chunk['date']), dimension_codes(category)],
+                             chunk['cost'], ('cost', 'row_count'), ['month', 'category'])
+        self.cost_totals = self._add_frame(self.cost_totals, grouped)
+
+    def add_customers(self, chunk: pd.DataFrame):
+        self.tables.add('customers')
+        totals = self.customer_totals
+        totals['total_customers'] += len(chunk)
+        for name, column in CUSTOMER_FLAGS.items():
+            totals[name] += int((chunk[column] == True).sum())
+        for measure in CUSTOMER_MEASURES:
+            totals[f'{measure}_sum'] += float(chunk[measure].sum())
+            totals[f'{measure}_count'] += int(chunk[measure].count())
+
+    def add(self, table: str, chunk: pd.DataFrame):
+        adders = {
+            'revenue': self.add_revenue,
+            'customers': self.add_customers,
+            'marketing': self.add_marketing,
+            'costs': self.add_costs
+        }
+        if table not in adders:
+            raise ValueError(f'Unknown table: {table}')
+        adders[table](chunk)
+
+    def merge(self, other: 'KPIAccumulator') -> 'KPIAccumulator':
+        self.tables |= other.tables
+        self.monthly_revenue = self._add_frame(self.monthly_revenue, other.monthly_revenue)
+        self.channel_revenue = self.channel_revenue.add(other.channel_revenue, fill_value=0)
+        self.channel_spend = self._add_frame(self.channel_spend, other.channel_spend)
+        self.cost_totals = self._add_frame(self.cost_totals, other.cost_totals)
+        for key, value in other.customer_totals.items():
+            self.customer_totals[key] += value
+        return self
+
+    def to_aggregates(self) -> Dict[str, pd.DataFrame]:
+        # Same frames as DatabaseManager.get_kpi_aggregates
+        aggregates = {}
+        if 'revenue' in self.tables:
+            monthly = self.monthly_revenue.sort_index()
+            aggregates['monthly_revenue'] = pd.DataFrame({
+                'month': month_labels(monthly.index),
+                'revenue': monthly['revenue'].values,
+                'row_count': monthly['row_count'].values.astype(int)
+            })
+            if not self.channel_revenue.empty:
+                aggregates['channel_revenue'] = self.channel_revenue.rename_axis('channel').reset_index(name='revenue')
+        if 'marketing' in self.tables:
+            spend = self.channel_spend.sort_index()
+            aggregates['channel_spend'] = pd.DataFrame({
+                'month': month_labels(spend.index.get_level_values(0)),
+                'channel': spend.index.get_level_values(1),
+                'spend': spend['spend'].values,
+                'row_count': spend['row_count'].values.astype(int)
+            })
+        if 'costs' in self.tables:
+            costs = self.cost_totals.sort_index()
+            aggregates['cost_totals'] = pd.DataFrame({
+                'month': month_labels(costs.index.get_level_values(0)),
+                'category': costs.index.get_level_values(1),
+                'cost': costs['cost'].values,
+                'row_count': costs['row_count'].values.astype(int)
+            })
+        if 'customers' in self.tables:
+            aggregates['customer_summary'] = pd.DataFrame([self.customer_totals])
+        return aggregates
+
+    @classmethod
+    def from_aggregates(cls, aggregates: Dict[str, pd.DataFrame]) -> 'KPIAccumulator':
+        # Inverse of to_aggregates; also accepts DatabaseManager.get_kpi_aggregates output
+        accumulator = cls()
+        if 'monthly_revenue' in aggregates:
+            frame = aggregates['monthly_revenue']
+            accumulator.tables.add('revenue')
+            accumulator.monthly_revenue = pd.DataFrame(
+                {'revenue': frame['revenue'].values, 'row_count': frame['row_count'].values},
+                index=pd.DatetimeIndex(to_month(frame['month']), name='month')
+            )
+            if 'channel_revenue' in aggregates:
+                accumulator.channel_revenue = aggregates['channel_revenue'].set_index('channel')['revenue']
+        for name, table, dimension, measure in (('channel_spend', 'marketing', 'channel', 'spend'),
+                                                ('cost_totals', 'costs', 'category', 'cost')):
+            if name in aggregates:
+                frame = aggregates[name]
+                accumulator.tables.add(table)
+                # Level names match group_sums, so restored state aligns with new chunks in add()
+                index = pd.MultiIndex.from_arrays([pd.DatetimeIndex(to_month(frame['month'])), frame[dimension]],
+                                                  names=['month', dimension])
+                setattr(accumulator, name, pd.DataFrame(
+                    {measure: frame[measure].values, 'row_count': frame['row_count'].values}, index=index
+                ))
+        if 'customer_summary' in aggregates:
+            accumulator.tables.add('customers')
+            accumulator.customer_totals = aggregates['customer_summary'].to_dict(orient='records')[0]
+        return accumulator
+
+    def to_dict(self) -> Dict[str, Dict[str, list]]:
+        # JSON-serialisable snapshot, used to persist partial state between refreshes
+        return {name: frame.to_dict(orient='list') for name, frame in self.to_aggregates().items()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Dict[str, list]]) -> 'KPIAccumulator':
+        return cls.from_aggregates({name: pd.DataFrame(columns) for name, columns in data.items()})
@@ -0,0 +1,142 @@
+# BizMetrics360 - KPI Report Cache
+import copy
+import glob
+import hashlib
+import json
+import os
+import threading
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+import pandas as pd
+
+
+def frames_version(data_dict: Dict[str, pd.DataFrame]) -> str:
+    # Content hash of in-memory frames; compute it once when the data is loaded, not per lookup
+    digest = hashlib.sha1()
+    for table in sorted(data_dict):
+        frame = data_dict[table]
+        digest.update(json.dumps([table, list(map(str, frame.columns)), list(map(str, frame.dtypes))]).encode())
+        digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class KPICache:
+    """Bounded LRU of KPI reports with an optional on-disk tier.
+
+    Keys are built from a dataset version (DatabaseManager.get_dataset_version
+    or frames_version) plus the report parameters, so a lookup never touches
+    the data itself. Entries evicted from memory stay on disk when disk_dir
+    is set, up to max_disk_entries files (max_entries by default), least
+    recently used pruned first; invalidate() drops both tiers and is meant
+    to be registered with DatabaseManager.add_write_listener.
+    """
+
+    def __init__(self, max_entries: int = 64, disk_dir: Optional[str] = None,
+                 max_disk_entries: Optional[int] = None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries or max_entries
+        self.logger = logging.getLogger(__name__)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        # Streamlit serves sessions from several threads
+        self._lock = threading.RLock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(version: str, name: str, **params) -> str:
+        payload = json.dumps([version, name, params], sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f'{key}.json')
+
+    def _remember(self, key: str, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(self._entries[key])
+            if self.disk_dir and os.path.exists(self._disk_path(key)):
+                try:
+                    with open(self._disk_path(key)) as f:
+                        value = json.load(f)
+                    # The file's mtime is its recency for _prune_disk
+                    os.utime(self._disk_path(key))
+                    self._remember(key, value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return copy.deepcopy(value)
+                except Exception as e:
+                    self.logger.warning(f'Ignoring unreadable cache entry {key}: {e}')
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value):
+        with self._lock:
+            self._remember(key, copy.deepcopy(value))
+            if self.disk_dir:
+                try:
+                    # Written next to the target and renamed, so readers never see a partial file
+                    temp_path = self._disk_path(key) + '.tmp'
+                    with open(temp_path, 'w') as f:
+                        json.dump(value, f, default=float)
+                    os.replace(temp_path, self._disk_path(key))
+                    self._prune_disk()
+                except Exception as e:
+                    self.logger.error(f'Error writing cache entry {key}: {e}')
+
+    def _prune_disk(self):
+        # Oldest-used files first, until the disk tier is back within max_disk_entries
+        paths = sorted(glob.glob(os.path.join(self.disk_dir, '*.json')), key=os.path.getmtime)
+        for path in paths[:max(len(paths) - self.max_disk_entries, 0)]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                self.logger.warning(f'Could not remove cache entry {path}: {e}')
+
+    def get_or_compute(self, key: str, compute: Callable[[], Dict]):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            # Failed computations return {} and are not worth keeping
+            if value:
+                self.put(key, value)
+        return value
+
+    def invalidate(self, table: Optional[str] = None):
+        # Reports span every table, so a write to any table drops all entries
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+            if self.disk_dir:
+                for path in glob.glob(os.path.join(self.disk_dir, '*.json')):
+                    try:
+                        os.remove(path)
+                    except OSError as e:
+                        self.logger.warning(f'Could not remove cache entry {path}: {e}')
+        if table:
+            self.logger.info(f'KPI cache invalidated after write to {table}')
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'invalidations': self.invalidations
+            }
@@ -1,65 +1,142 @@
 ﻿# BizMetrics360 - KPI Calculator Module
+import json
+import os
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterable, List, Tuple, Optional, Union
 import logging
+from kpi_accumulator import KPIAccumulator, month_labels, to_month
+from kpi_cache import KPICache, frames_version
+from cohort_analysis import CohortEngine
+from sketches import CustomerSketches
 
 class KPICalculator:
-    def __init__(self):
+    def __init__(self, cache: Optional[KPICache] = None):
         self.logger = logging.getLogger(__name__)
+        self._refresh_state = {}
+        self.cache = cache or KPICache()
+        self._watched = set()
         
-    def calculate_revenue_growth_rate(self, revenue_data: pd.DataFrame, period: str = 'monthly') -> Dict[str, float]:
+    def _monthly_revenue(self, revenue_data) -> pd.Series:
+        # Revenue summed per calendar month without touching the caller's frame. Accepts a frame
+        # with a 'date' column, or a frame/Series already indexed by a DatetimeIndex, whose
+        # values are bucketed directly instead of being parsed again.
+        if isinstance(revenue_data, pd.Series):
+            dates, revenue = revenue_data.index, revenue_data
+        elif 'date' not in revenue_data.columns and isinstance(revenue_data.index, pd.DatetimeIndex):
+            dates, revenue = revenue_data.index, revenue_data['revenue']
+        else:
+            dates, revenue = revenue_data['date'], revenue_data['revenue']
+        
+        values = np.asarray(dates)
+        if np.issubdtype(values.dtype, np.datetime64):
+            months = values.astype('datetime64[M]')
+        else:
+            months = to_month(dates)
+        present = ~np.isnat(months)
+        distinct, codes = np.unique(months[present], return_inverse=True)
+        weights = np.nan_to_num(revenue.to_numpy(dtype=np.float64)[present])
+        totals = np.bincount(codes, weights=weights, minlength=len(distinct))
+        return pd.Series(totals, index=pd.DatetimeIndex(distinct.astype('datetime64[ns]')))
+    
+    def _period_revenue(self, monthly: pd.Series, period: str) -> pd.Series:
+        if period == 'monthly':
+            return monthly
+        freq = 'Q' if period == 'quarterly' else 'Y'
+        return monthly.groupby(monthly.index.to_period(freq).to_timestamp()).sum()
+    
+    def _growth_from_period_revenue(self, period_revenue: pd.Series, yoy_periods: int) -> Dict[str, float]:
+        growth = period_revenue.pct_change(fill_method=None) * 100
+        latest = period_revenue.iloc[-1]
+        previous = period_revenue.iloc[-2] if len(period_revenue) > 1 else latest
+        # Same period one year earlier by calendar, so gaps in the series do not shift it
+        year_ago = period_revenue.get(period_revenue.index[-1] - pd.DateOffset(months=12))
+        yoy_growth = (latest - year_ago) / year_ago * 100 if year_ago else 0.0
+        
+        return {
+            'current_revenue': float(latest),
+            'previous_revenue': float(previous),
+            'growth_rate': float(growth.iloc[-1]) if not pd.isna(growth.iloc[-1]) else 0.0,
+            'avg_growth_rate': float(growth.mean()) if len(period_revenue) > 1 else 0.0,
+            'yoy_growth': float(yoy_growth),
+            'yoy_periods': yoy_periods
+        }
+    
+    def calculate_growth_rates(self, revenue_data) -> Dict[str, Dict[str, float]]:
+        # Monthly, quarterly and yearly growth from a single monthly bucketing of the dates
         try:
-            revenue_data['date'] = pd.to_datetime(revenue_data['date'])
-            revenue_data = revenue_data.sort_values('date')
-            
-            if period == 'monthly':
-                revenue_data['period'] = revenue_data['date'].dt.to_period('M')
-            elif period == 'quarterly':
-                revenue_data['period'] = revenue_data['date'].dt.to_period('Q')
-            else:
-                revenue_data['period'] = revenue_data['date'].dt.to_period('Y')
-            
-            period_revenue = revenue_data.groupby('period')['revenue'].sum().reset_index()
-            period_revenue['growth_rate'] = period_revenue['revenue'].pct_change() * 100
-            
-            latest = period_revenue.iloc[-1]
-            previous = period_revenue.iloc[-2] if len(period_revenue) > 1 else latest
-            
+            monthly = self._monthly_revenue(revenue_data)
             return {
-                'current_revenue': float(latest['revenue']),
-                'previous_revenue': float(previous['revenue']),
-                'growth_rate': float(latest['growth_rate']) if not pd.isna(latest['growth_rate']) else 0.0,
-                'avg_growth_rate': float(period_revenue['growth_rate'].mean()) if len(period_revenue) > 1 else 0.0
+                period: self._growth_from_period_revenue(self._period_revenue(monthly, period), yoy_periods)
+                for period, yoy_periods in (('monthly', 12), ('quarterly', 4), ('yearly', 1))
             }
+        except Exception as e:
+            self.logger.error(f'Error calculating growth rates: {e}')
+            return {}
+    
+    def calculate_revenue_growth_rate(self, revenue_data, period: str = 'monthly') -> Dict[str, float]:
+        try:
+            period = period if period in ('monthly', 'quarterly') else 'yearly'
+            period_revenue = self._period_revenue(self._monthly_revenue(revenue_data), period)
+            result = self._growth_from_period_revenue(period_revenue, 12)
+            return {key: result[key] for key in ('current_revenue', 'previous_revenue', 'growth_rate', 'avg_growth_rate')}
         except Exception as e:
             self.logger.error(f'Error calculating revenue growth rate: {e}')
             return {}
     
+    def _cac_clv_from_totals(self, total_marketing_spend: float, new_customers: int, avg_order_value: float,
+                             avg_purchase_frequency: float, avg_customer_lifespan: float) -> Dict[str, float]:
+        cac = total_marketing_spend / new_customers if new_customers > 0 else 0
+        clv = avg_order_value * avg_purchase_frequency * avg_customer_lifespan
+        clv_cac_ratio = clv / cac if cac > 0 else 0
+        
+        return {
+            'cac': float(cac),
+            'clv': float(clv),
+            'clv_cac_ratio': float(clv_cac_ratio),
+            'avg_order_value': float(avg_order_value),
+            'avg_purchase_frequency': float(avg_purchase_frequency),
+            'avg_customer_lifespan': float(avg_customer_lifespan),
+            'total_marketing_spend': float(total_marketing_spend),
+            'new_customers': int(new_customers)
+        }
+    
+    def _retention_churn_from_counts(self, total_customers: int, active_customers: int,
+                                     churned_customers: int) -> Dict[str, float]:
+        retention_rate = (active_customers / total_customers) * 100 if total_customers > 0 else 0
+        churn_rate = (churned_customers / total_customers) * 100 if total_customers > 0 else 0
+        
+        return {
+            'retention_rate': float(retention_rate),
+            'churn_rate': float(churn_rate),
+            'total_customers': int(total_customers),
+            'active_customers': int(active_customers),
+            'churned_customers': int(churned_customers)
+        }
+    
+    def _gross_margin_from_totals(self, total_revenue: float, total_costs: float) -> Dict[str, float]:
+        gross_margin = ((total_revenue - total_costs) / total_revenue) * 100 if total_revenue > 0 else 0
+        gross_profit = total_revenue - total_costs
+        
+        return {
+            'gross_margin': float(gross_margin),
+            'gross_profit': float(gross_profit),
+            'total_revenue': float(total_revenue),
+            'total_costs': float(total_costs)
+        }
+    
     def calculate_cac_clv_metrics(self, customer_data: pd.DataFrame, marketing_data: pd.DataFrame) -> Dict[str, float]:
         try:
             total_marketing_spend = marketing_data['spend'].sum()
             new_customers = len(customer_data[customer_data['is_new_customer'] == True])
-            cac = total_marketing_spend / new_customers if new_customers > 0 else 0
             
             avg_order_value = customer_data['total_spent'].mean()
             avg_purchase_frequency = customer_data['purchase_count'].mean()
             avg_customer_lifespan = customer_data['customer_lifespan_days'].mean() / 365
             
-            clv = avg_order_value * avg_purchase_frequency * avg_customer_lifespan
-            clv_cac_ratio = clv / cac if cac > 0 else 0
-            
-            return {
-                'cac': float(cac),
-                'clv': float(clv),
-                'clv_cac_ratio': float(clv_cac_ratio),
-                'avg_order_value': float(avg_order_value),
-                'avg_purchase_frequency': float(avg_purchase_frequency),
-                'avg_customer_lifespan': float(avg_customer_lifespan),
-                'total_marketing_spend': float(total_marketing_spend),
-                'new_customers': int(new_customers)
-            }
+            return self._cac_clv_from_totals(total_marketing_spend, new_customers, avg_order_value,
+                                             avg_purchase_frequency, avg_customer_lifespan)
         except Exception as e:
             self.logger.error(f'Error calculating CAC/CLV metrics: {e}')
             return {}
@@ -68,61 +145,71 @@ class KPICalculator:
         try:
             total_customers = len(customer_data)
             active_customers = len(customer_data[customer_data['is_active'] == True])
-            retention_rate = (active_customers / total_customers) * 100 if total_customers > 0 else 0
-            
             churned_customers = len(customer_data[customer_data['churned'] == True])
-            churn_rate = (churned_customers / total_customers) * 100 if total_customers > 0 else 0
             
-            return {
-                'retention_rate': float(retention_rate),
-                'churn_rate': float(churn_rate),
-                'total_customers': int(total_customers),
-                'active_customers': int(active_customers),
-                'churned_customers': int(churned_customers)
-            }
+            return self._retention_churn_from_counts(total_customers, active_customers, churned_customers)
         except Exception as e:
             self.logger.error(f'Error calculating retention/churn metrics: {e}')
             return {}
     
-    def calculate_gross_margin(self, revenue_data: pd.DataFrame, cost_data: pd.DataFrame) -> Dict[str, float]:
+    def calculate_cohort_matrices(self, customer_data: pd.DataFrame, as_of=None) -> Dict[str, pd.DataFrame]:
+        # Cohort x period-offset view behind the single retention rate; see CohortEngine
         try:
-            total_revenue = revenue_data['revenue'].sum()
-            total_costs = cost_data['cost'].sum()
-            
-            gross_margin = ((total_revenue - total_costs) / total_revenue) * 100 if total_revenue > 0 else 0
-            gross_profit = total_revenue - total_costs
-            
+            engine = CohortEngine.from_customers(customer_data)
             return {
-                'gross_margin': float(gross_margin),
-                'gross_profit': float(gross_profit),
-                'total_revenue': float(total_revenue),
-                'total_costs': float(total_costs)
+                'retention': engine.retention_matrix(as_of),
+                'revenue': engine.revenue_matrix(as_of)
             }
+        except Exception as e:
+            self.logger.error(f'Error calculating cohort matrices: {e}')
+            return {}
+    
+    def calculate_sketch_metrics(self, customers: Union[pd.DataFrame, CustomerSketches],
+                                 regions: Optional[List[str]] = None, segments: Optional[List[str]] = None,
+                                 months: Optional[List[str]] = None,
+                                 quantiles: Iterable[float] = (0.25, 0.5, 0.75, 0.9, 0.99)) -> Dict[str, Dict[str, float]]:
+        # Approximate distinct customers (HyperLogLog) and percentiles of spend, purchases and
+        # lifespan (KLL); each section reports its error bound. Pass a CustomerSketches built per
+        # partition (and merged) to avoid touching the rows at all.
+        try:
+            sketches = customers if isinstance(customers, CustomerSketches) else CustomerSketches().add(customers)
+            return sketches.summary(regions, segments, months, quantiles)
+        except Exception as e:
+            self.logger.error(f'Error calculating sketch metrics: {e}')
+            return {}
+    
+    def calculate_gross_margin(self, revenue_data: pd.DataFrame, cost_data: pd.DataFrame) -> Dict[str, float]:
+        try:
+            return self._gross_margin_from_totals(revenue_data['revenue'].sum(), cost_data['cost'].sum())
         except Exception as e:
             self.logger.error(f'Error calculating gross margin: {e}')
             return {}
     
-    def calculate_roi_by_channel(self, marketing_data: pd.DataFrame, revenue_data: pd.DataFrame) -> Dict[str, Dict[str, float]]:
+    def _channel_roi(self, spend: pd.DataFrame, revenue: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+        # Both sides are already one row per key, so the join cannot multiply rows
+        roi_data = spend.merge(revenue, on=keys, how='left')
+        roi_data['roi'] = ((roi_data['revenue'] - roi_data['spend']) / roi_data['spend']) * 100
+        roi_data['roas'] = roi_data['revenue'] / roi_data['spend']
+        roi_data['profit'] = roi_data['revenue'] - roi_data['spend']
+        return roi_data
+    
+    def calculate_roi_by_channel(self, marketing_data: pd.DataFrame, revenue_data: pd.DataFrame,
+                                 revenue_channel: str = 'channel') -> Dict[str, Dict[str, float]]:
+        # revenue_data may be raw rows or per-channel totals; revenue_channel names its channel column
         try:
-            roi_data = marketing_data.merge(revenue_data, on='channel', how='left')
-            roi_data['roi'] = ((roi_data['revenue'] - roi_data['spend']) / roi_data['spend']) * 100
-            roi_data['roas'] = roi_data['revenue'] / roi_data['spend']
+            spend = marketing_data.groupby('channel', as_index=False, observed=True)['spend'].sum()
+            revenue = (revenue_data.groupby(revenue_channel, observed=True)['revenue'].sum()
+                       .rename_axis('channel').reset_index())
+            roi_data = self._channel_roi(spend, revenue, ['channel'])
             
-            channel_metrics = {}
-            for _, row in roi_data.iterrows():
-                channel_metrics[row['channel']] = {
-                    'spend': float(row['spend']),
-                    'revenue': float(row['revenue']),
-                    'roi': float(row['roi']),
-                    'roas': float(row['roas']),
-                    'profit': float(row['revenue'] - row['spend'])
-                }
+            channel_metrics = (roi_data.astype({'channel': str}).set_index('channel')
+                               [['spend', 'revenue', 'roi', 'roas', 'profit']].to_dict(orient='index'))
             
             total_spend = roi_data['spend'].sum()
             total_revenue = roi_data['revenue'].sum()
             overall_roi = ((total_revenue - total_spend) / total_spend) * 100 if total_spend > 0 else 0
             
-            return {
+            result = {
                 'channels': channel_metrics,
                 'overall': {
                     'total_spend': float(total_spend),
@@ -131,11 +218,185 @@ class KPICalculator:
                     'avg_roi': float(roi_data['roi'].mean())
                 }
             }
+            
+            if 'date' in revenue_data.columns and ({'month', 'date'} & set(marketing_data.columns)):
+                monthly = self.calculate_monthly_roi_by_channel(marketing_data, revenue_data, revenue_channel)
+                result['monthly'] = {
+                    str(channel): dict(zip(group['month'], group['roi'].astype(float)))
+                    for channel, group in monthly.groupby('channel', observed=True)
+                }
+            
+            return result
         except Exception as e:
             self.logger.error(f'Error calculating ROI by channel: {e}')
             return {}
     
+    def calculate_monthly_roi_by_channel(self, marketing_data: pd.DataFrame, revenue_data: pd.DataFrame,
+                                         revenue_channel: str = 'channel') -> pd.DataFrame:
+        # One row per channel and month with spend, attributed revenue, ROI %, ROAS and profit
+        try:
+            month_column = 'month' if 'month' in marketing_data.columns else 'date'
+            spend_month = pd.Series(to_month(marketing_data[month_column]).astype('datetime64[ns]'),
+                                    index=marketing_data.index, name='month')
+            revenue_month = pd.Series(to_month(revenue_data['date']).astype('datetime64[ns]'),
+                                      index=revenue_data.index, name='month')
+            
+            spend = (marketing_data.groupby(['channel', spend_month], observed=True)['spend'].sum()
+                     .reset_index())
+            revenue = (revenue_data.groupby([revenue_data[revenue_channel].rename('channel'), revenue_month],
+                                            observed=True)['revenue'].sum()
+                       .reset_index())
+            roi_data = self._channel_roi(spend, revenue, ['channel', 'month'])
+            roi_data['month'] = month_labels(pd.DatetimeIndex(roi_data['month']))
+            return roi_data.sort_values(['channel', 'month'], ignore_index=True)
+        except Exception as e:
+            self.logger.error(f'Error calculating monthly ROI by channel: {e}')
+            return pd.DataFrame()
+    
+    def scenario_baseline(self, report: Dict[str, Dict[str, float]]) -> Dict[str, object]:
+        # Inputs of evaluate_scenarios, taken from a generate_kpi_report result
+        cac_clv = report.get('cac_clv', {})
+        profitability = report.get('profitability', {})
+        channels = report.get('roi_channels', {}).get('channels', {})
+        if channels:
+            channel_spend = {c: float(np.nan_to_num(m['spend'])) for c, m in channels.items()}
+            channel_revenue = {c: float(np.nan_to_num(m['revenue'])) for c, m in channels.items()}
+        else:
+            # Without channel attribution spend still drives acquisition, but no revenue is tied to it
+            channel_spend = {'all': float(cac_clv.get('total_marketing_spend', 0))}
+            channel_revenue = {'all': 0.0}
+        
+        return {
+            'total_revenue': float(profitability.get('total_revenue', 0)),
+            'total_costs': float(profitability.get('total_costs', 0)),
+            'channel_spend': channel_spend,
+            'channel_revenue': channel_revenue,
+            'new_customers': float(cac_clv.get('new_customers', 0)),
+            'avg_order_value': float(cac_clv.get('avg_order_value', 0)),
+            'avg_purchase_frequency': float(cac_clv.get('avg_purchase_frequency', 0)),
+            'avg_customer_lifespan': float(cac_clv.get('avg_customer_lifespan', 0)),
+            'churn_rate': float(report.get('retention_churn', {}).get('churn_rate', 0))
+        }
+    
+    def evaluate_scenarios(self, report: Dict[str, Dict[str, float]],
+                           spend_changes: Union[Iterable[float], Dict[str, Iterable[float]]] = (0,),
+                           churn_deltas: Iterable[float] = (0,), price_changes: Iterable[float] = (0,),
+                           spend_elasticity: float = 1.0, price_elasticity: float = 0.0) -> pd.DataFrame:
+        """What-if KPIs for every combination of the given parameters.
+        
+        spend_changes are % changes applied to every channel, or a dict of
+        per-channel values (one grid axis per channel, unnamed channels stay
+        unchanged); churn_deltas are percentage points added to the churn
+        rate; price_changes are % changes in price. The whole grid is
+        evaluated as one set of array operations, one row per scenario.
+        
+        Channel revenue and new customers scale with spend ** spend_elasticity
+        (1.0 keeps ROAS and CAC constant), recurring revenue with the retained
+        share, expected lifespan with 1 / churn and sold volume with
+        (1 + price change) ** -price_elasticity. Costs follow sold volume plus
+        the extra marketing spend.
+        """
+        try:
+            baseline = report if 'channel_spend' in report else self.scenario_baseline(report)
+            channels = list(baseline['channel_spend'])
+            base_spend = np.array([baseline['channel_spend'][c] for c in channels])
+            base_channel_revenue = np.array([baseline['channel_revenue'][c] for c in channels])
+            
+            if isinstance(spend_changes, dict):
+                unknown = set(spend_changes) - set(channels)
+                if unknown:
+                    raise ValueError(f'Unknown channels: {sorted(unknown)}')
+                axes = {f'spend_change_{c}': np.asarray(list(v), dtype=np.float64) for c, v in spend_changes.items()}
+                spend_columns = [channels.index(c) for c in spend_changes]
+            else:
+                axes = {'spend_change': np.asarray(list(spend_changes), dtype=np.float64)}
+                spend_columns = None
+            axes['churn_delta'] = np.asarray(list(churn_deltas), dtype=np.float64)
+            axes['price_change'] = np.asarray(list(price_changes), dtype=np.float64)
+            
+            grid = dict(zip(axes, (g.ravel() for g in np.meshgrid(*axes.values(), indexing='ij'))))
+            scenarios = len(grid['churn_delta'])
+            
+            # Spend multiplier per scenario and channel
+            multiplier = np.ones((scenarios, len(channels)))
+            if spend_columns is None:
+                multiplier[:] = 1 + grid['spend_change'][:, None] / 100
+            else:
+                for column, name in zip(spend_columns, list(axes)[:len(spend_columns)]):
+                    multiplier[:, column] = 1 + grid[name] / 100
+            multiplier = np.maximum(multiplier, 0)
+            reach = multiplier ** spend_elasticity
+            
+            total_spend = base_spend.sum()
+            spend = multiplier @ base_spend
+            attributed = reach @ base_channel_revenue
+            acquisition = reach @ base_spend / total_spend if total_spend > 0 else np.ones(scenarios)
+            
+            churn = baseline['churn_rate']
+            new_churn = np.clip(churn + grid['churn_delta'], 0, 100)
+            retained = (100 - new_churn) / (100 - churn) if churn < 100 else np.ones(scenarios)
+            if churn > 0:
+                lifespan = np.divide(churn, new_churn, out=np.full(scenarios, np.nan), where=new_churn > 0)
+            else:
+                lifespan = np.ones(scenarios)
+            price = 1 + grid['price_change'] / 100
+            volume = np.maximum(price, 0) ** -price_elasticity
+            
+            base_revenue = baseline['total_revenue']
+            unattributed = max(base_revenue - base_channel_revenue.sum(), 0)
+            units = (unattributed + attributed) * retained * volume
+            revenue = units * price
+            costs = (baseline['total_costs'] * units / base_revenue if base_revenue > 0
+                     else np.full(scenarios, baseline['total_costs'])) + spend - total_spend
+            new_customers = baseline['new_customers'] * acquisition
+            cac = np.divide(spend, new_customers, out=np.zeros(scenarios), where=new_customers > 0)
+            clv = (baseline['avg_order_value'] * price * baseline['avg_purchase_frequency'] * volume
+                   * baseline['avg_customer_lifespan'] * lifespan)
+            
+            result = pd.DataFrame(grid)
+            result['revenue'] = revenue
+            result['revenue_change'] = (revenue / base_revenue - 1) * 100 if base_revenue > 0 else np.nan
+            result['marketing_spend'] = spend
+            result['new_customers'] = new_customers
+            result['cac'] = cac
+            result['clv'] = clv
+            result['clv_cac_ratio'] = np.divide(clv, cac, out=np.zeros(scenarios), where=cac > 0)
+            result['total_costs'] = costs
+            result['gross_profit'] = revenue - costs
+            result['gross_margin'] = np.divide(revenue - costs, revenue, out=np.zeros(scenarios), where=revenue > 0) * 100
+            return result
+        except Exception as e:
+            self.logger.error(f'Error evaluating scenarios: {e}')
+            return pd.DataFrame()
+    
     def generate_kpi_report(self, data_dict: Dict[str, pd.DataFrame]) -> Dict[str, Dict[str, float]]:
+        # Fused path: one pass per table into mergeable sums and counts, then every
+        # section is derived from those. ROI by channel still joins the raw frames.
+        try:
+            accumulator = KPIAccumulator()
+            for table in ('revenue', 'customers', 'marketing', 'costs'):
+                if table in data_dict:
+                    accumulator.add(table, data_dict[table])
+        except (KeyError, AttributeError, TypeError, ValueError) as e:
+            # Frames missing columns the fused pass needs still get the sections they can support
+            self.logger.debug(f'Fused KPI pass unavailable, computing per metric: {e}')
+            return self._generate_kpi_report_per_metric(data_dict)
+        
+        try:
+            aggregates = accumulator.to_aggregates()
+            aggregates.pop('channel_revenue', None)
+            report = self.generate_kpi_report_from_aggregates(aggregates)
+            report.pop('roi_channels', None)
+            if 'marketing' in data_dict and 'revenue' in data_dict:
+                report['roi_channels'] = self.calculate_roi_by_channel(
+                    data_dict['marketing'], data_dict.get('revenue_by_channel', data_dict['revenue'])
+                )
+            return report
+        except Exception as e:
+            self.logger.error(f'Error generating KPI report: {e}')
+            return {}
+    
+    def _generate_kpi_report_per_metric(self, data_dict: Dict[str, pd.DataFrame]) -> Dict[str, Dict[str, float]]:
         try:
             report = {}
             
@@ -152,9 +413,151 @@ class KPICalculator:
                 report['profitability'] = self.calculate_gross_margin(data_dict['revenue'], data_dict['costs'])
             
             if 'marketing' in data_dict and 'revenue' in data_dict:
-                report['roi_channels'] = self.calculate_roi_by_channel(data_dict['marketing'], data_dict['revenue'])
+                report['roi_channels'] = self.calculate_roi_by_channel(
+                    data_dict['marketing'], data_dict.get('revenue_by_channel', data_dict['revenue'])
+                )
             
             return report
         except Exception as e:
             self.logger.error(f'Error generating KPI report: {e}')
             return {}
+    
+    def generate_kpi_report_from_aggregates(self, aggregates: Dict[str, pd.DataFrame]) -> Dict[str, Dict[str, float]]:
+        # Builds the same report as generate_kpi_report from the compact frames returned by
+        # DatabaseManager.get_kpi_aggregates, so the raw rows never have to be loaded
+        try:
+            report = {}
+            monthly_revenue = aggregates.get('monthly_revenue')
+            customer_summary = aggregates.get('customer_summary')
+            channel_spend = aggregates.get('channel_spend')
+            cost_totals = aggregates.get('cost_totals')
+            
+            if monthly_revenue is not None:
+                report['revenue_growth'] = self.calculate_revenue_growth_rate(
+                    monthly_revenue[['month', 'revenue']].rename(columns={'month': 'date'})
+                )
+            
+            if customer_summary is not None and channel_spend is not None:
+                summary = customer_summary.iloc[0]
+                report['cac_clv'] = self._cac_clv_from_totals(
+                    channel_spend['spend'].sum(),
+                    summary['new_customers'],
+                    self._safe_mean(summary['total_spent_sum'], summary['total_spent_count']),
+                    self._safe_mean(summary['purchase_count_sum'], summary['purchase_count_count']),
+                    self._safe_mean(summary['customer_lifespan_days_sum'], summary['customer_lifespan_days_count']) / 365
+                )
+            
+            if customer_summary is not None:
+                summary = customer_summary.iloc[0]
+                report['retention_churn'] = self._retention_churn_from_counts(
+                    summary['total_customers'], summary['active_customers'], summary['churned_customers']
+                )
+            
+            if monthly_revenue is not None and cost_totals is not None:
+                report['profitability'] = self._gross_margin_from_totals(
+                    monthly_revenue['revenue'].sum(), cost_totals['cost'].sum()
+                )
+            
+            if channel_spend is not None and monthly_revenue is not None:
+                # Revenue is only attributable to channels when a per-channel revenue frame is supplied
+                channel_revenue = aggregates.get('channel_revenue')
+                if channel_revenue is not None:
+                    spend = channel_spend.groupby('channel', as_index=False, observed=True)['spend'].sum()
+                    report['roi_channels'] = self.calculate_roi_by_channel(spend, channel_revenue)
+                else:
+                    report['roi_channels'] = {}
+            
+            return report
+        except Exception as e:
+            self.logger.error(f'Error generating KPI report from aggregates: {e}')
+            return {}
+    
+    def generate_kpi_report_streaming(self, chunk_iterators: Dict[str, Iterable[pd.DataFrame]],
+                                      accumulator: Optional[KPIAccumulator] = None) -> Dict[str, Dict[str, float]]:
+        # Folds each chunk into mergeable partial state, so peak memory is one chunk
+        # rather than the whole table (e.g. DatabaseManager.iter_all_data)
+        try:
+            accumulator = accumulator or KPIAccumulator()
+            for table, chunks in chunk_iterators.items():
+                for chunk in chunks:
+                    accumulator.add(table, chunk)
+            return self.generate_kpi_report_from_aggregates(accumulator.to_aggregates())
+        except Exception as e:
+            self.logger.error(f'Error generating streaming KPI report: {e}')
+            return {}
+    
+    def generate_kpi_report_cached(self, data_dict: Dict[str, pd.DataFrame],
+                                   version: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+        # Pass the version computed when the frames were loaded; without one they are hashed here
+        version = version or frames_version(data_dict)
+        key = KPICache.make_key(version, 'kpi_report')
+        return self.cache.get_or_compute(key, lambda: self.generate_kpi_report(data_dict))
+    
+    def generate_kpi_report_from_db(self, db_manager, start_date=None, end_date=None,
+                                    regions: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+        # Keyed by DatabaseManager.get_dataset_version, so a hit reads no table rows
+        try:
+            if id(db_manager) not in self._watched:
+                db_manager.add_write_listener(self.cache.invalidate)
+                self._watched.add(id(db_manager))
+            
+            def compute():
+                return self.generate_kpi_report_from_aggregates(
+                    db_manager.get_kpi_aggregates(start_date, end_date, regions)
+                )
+            
+            version = db_manager.get_dataset_version()
+            if not version:
+                return compute()
+            key = KPICache.make_key(version, 'kpi_report_from_db', start_date=start_date, end_date=end_date,
+                                    regions=sorted(regions) if regions else None)
+            return self.cache.get_or_compute(key, compute)
+        except Exception as e:
+            self.logger.error(f'Error generating cached KPI report: {e}')
+            return {}
+    
+    def _load_refresh_state(self, db_path: str, state_path: Optional[str]) -> Dict:
+        if db_path in self._refresh_state:
+            return self._refresh_state[db_path]
+        if state_path and os.path.exists(state_path):
+            with open(state_path) as f:
+                saved = json.load(f)
+            if saved.get('db_path') == db_path:
+                return {'watermarks': saved['watermarks'],
+                        'accumulator': KPIAccumulator.from_dict(saved['accumulator'])}
+        return {'watermarks': {}, 'accumulator': KPIAccumulator()}
+    
+    def refresh_kpi_report(self, db_manager, state_path: Optional[str] = None,
+                           chunksize: int = 100000) -> Dict[str, Dict[str, float]]:
+        # Reads only rows appended since the last refresh; a table whose existing rows were
+        # rewritten (e.g. a customer merge) is re-read in full
+        try:
+            state = self._load_refresh_state(db_manager.db_path, state_path)
+            accumulator = state['accumulator']
+            watermarks = db_manager.get_watermarks()
+            
+            for table, mark in watermarks.items():
+                previous = state['watermarks'].get(table)
+                since_id = previous['max_id'] if previous else 0
+                if (previous is None or previous['rewrite_version'] != mark['rewrite_version']
+                        or mark['max_id'] < since_id):
+                    accumulator.reset(table)
+                    since_id = 0
+                for chunk in db_manager.iter_new_rows(table, since_id, mark['max_id'], chunksize):
+                    accumulator.add(table, chunk)
+                accumulator.tables.add(table)
+            
+            state['watermarks'] = watermarks
+            self._refresh_state[db_manager.db_path] = state
+            if state_path:
+                with open(state_path, 'w') as f:
+                    json.dump({'db_path': db_manager.db_path, 'watermarks': watermarks,
+                               'accumulator': accumulator.to_dict()}, f)
+            
+            return self.generate_kpi_report_from_aggregates(accumulator.to_aggregates())
+        except Exception as e:
+            self.logger.error(f'Error refreshing KPI report: {e}')
+            return {}
+    
+    def _safe_mean(self, total: float, count: int) -> float:
+        return total / count if count > 0 else np.nan
@@ -0,0 +1,198 @@
+# BizMetrics360 - KPI Cube
+import itertools
+import logging
+import pandas as pd
+import numpy as np
+from typing import Dict, FrozenSet, Iterable, List, Optional
+from kpi_accumulator import CUSTOMER_FLAGS, CUSTOMER_MEASURES, month_labels, to_month
+from kpi_calculator import KPICalculator
+
+# Source columns for each cube dimension, first one present wins
+DIMENSION_SOURCES = {
+    'revenue': {'region': ['region'], 'channel': ['channel'], 'month': ['date']},
+    'customers': {'region': ['region'], 'segment': ['segment', 'company_size'],
+                  'month': ['cohort_month', 'signup_date']},
+    'marketing': {'channel': ['channel'], 'month': ['month', 'date']},
+    'costs': {'month': ['date']}
+}
+
+# Dimensions each frame of DatabaseManager.get_kpi_aggregates is broken down by
+OUTPUT_DIMENSIONS = {'revenue': ['month'], 'customers': [], 'marketing': ['month', 'channel'], 'costs': ['month']}
+
+
+class KPICube:
+    """Pre-aggregated additive KPI components for fast filtered reports.
+
+    Every table is summed once over the cube dimensions it carries (region,
+    segment, channel, month), then rolled up to every subset of those
+    dimensions. A filtered report reads the smallest cuboid that covers the
+    filters and derives ratios such as CLV:CAC and gross margin from the
+    sums, through KPICalculator.generate_kpi_report_from_aggregates.
+
+    Filters only apply to tables that carry the dimension, as with
+    DatabaseManager.get_kpi_aggregates; dates are matched by month.
+    """
+
+    def __init__(self, calculator: Optional[KPICalculator] = None):
+        self.logger = logging.getLogger(__name__)
+        self.calculator = calculator or KPICalculator()
+        self.dimensions: Dict[str, List[str]] = {}
+        self._parts: Dict[str, List[pd.DataFrame]] = {}
+        self._cuboids: Dict[str, Dict[FrozenSet[str], pd.DataFrame]] = {}
+
+    @classmethod
+    def from_data(cls, data_dict: Dict[str, pd.DataFrame],
+                  calculator: Optional[KPICalculator] = None) -> 'KPICube':
+        cube = cls(calculator)
+        for table, frame in data_dict.items():
+            if table in DIMENSION_SOURCES:
+                cube.add(table, frame)
+        return cube
+
+    @classmethod
+    def from_chunks(cls, chunk_iterators: Dict[str, Iterable[pd.DataFrame]],
+                    calculator: Optional[KPICalculator] = None) -> 'KPICube':
+        # e.g. DatabaseManager.iter_all_data; only the partial sums are kept
+        cube = cls(calculator)
+        for table, chunks in chunk_iterators.items():
+            for chunk in chunks:
+                cube.add(table, chunk)
+        return cube
+
+    def _components(self, table: str, chunk: pd.DataFrame) -> pd.DataFrame:
+        if table == 'customers':
+            components = {'total_customers': np.ones(len(chunk), dtype=np.int64)}
+            for name, column in CUSTOMER_FLAGS.items():
+                components[name] = (chunk[column] == True).to_numpy(dtype=np.int64)
+            for measure in CUSTOMER_MEASURES:
+                components[f'{measure}_sum'] = chunk[measure].to_numpy(dtype=np.float64)
+                components[f'{measure}_count'] = chunk[measure].notna().to_numpy(dtype=np.int64)
+            return pd.DataFrame(components, index=chunk.index)
+        measure = {'revenue': 'revenue', 'marketing': 'spend', 'costs': 'cost'}[table]
+        return pd.DataFrame({
+            measure: chunk[measure].to_numpy(dtype=np.float64),
+            'row_count': chunk[measure].notna().to_numpy(dtype=np.int64)
+        }, index=chunk.index)
+
+    def add(self, table: str, chunk: pd.DataFrame):
+        if table not in DIMENSION_SOURCES:
+            raise ValueError(f'Unknown table: {table}')
+        keys = {}
+        for dimension, sources in DIMENSION_SOURCES[table].items():
+            column = next((c for c in sources if c in chunk.columns), None)
+            if column is None:
+                continue
+            if dimension == 'month':
+                keys[dimension] = pd.Series(to_month(chunk[column]).astype('datetime64[ns]'), index=chunk.index)
+            else:
+                keys[dimension] = chunk[column]
+        dimensions = list(keys)
+        if self.dimensions.setdefault(table, dimensions) != dimensions:
+            raise ValueError(f'{table} chunks must carry the same cube dimensions')
+
+        components = self._components(table, chunk)
+        if dimensions:
+            # dropna=False keeps rows with a missing dimension in the totals
+            partial = components.groupby([keys[d].rename(d) for d in dimensions],
+                                         observed=True, dropna=False).sum()
+        else:
+            partial = components.sum().to_frame().T
+        self._parts.setdefault(table, []).append(partial)
+        self._cuboids.pop(table, None)
+
+    def _build_cuboids(self, table: str) -> Dict[FrozenSet[str], pd.DataFrame]:
+        dimensions = self.dimensions[table]
+        parts = self._parts[table]
+        base = parts[0] if len(parts) == 1 else pd.concat(parts)
+        if dimensions and len(parts) > 1:
+            base = base.groupby(level=dimensions, observed=True, dropna=False).sum()
+        self._parts[table] = [base]
+
+        cuboids = {}
+        for size in range(len(dimensions) + 1):
+            for subset in itertools.combinations(dimensions, size):
+                if size == len(dimensions):
+                    cuboids[frozenset(subset)] = base
+                elif subset:
+                    cuboids[frozenset(subset)] = base.groupby(level=list(subset), observed=True, dropna=False).sum()
+                else:
+                    cuboids[frozenset()] = base.sum().to_frame().T
+        return cuboids
+
+    def cuboid(self, table: str, dimensions: Iterable[str] = ()) -> pd.DataFrame:
+        if table not in self._cuboids:
+            self._cuboids[table] = self._build_cuboids(table)
+        return self._cuboids[table][frozenset(dimensions)]
+
+    def _slice(self, table: str, filters: Dict[str, Optional[List[str]]], start_date=None,
+               end_date=None, output: Optional[List[str]] = None) -> pd.DataFrame:
+        dimensions = self.dimensions[table]
+        applied = {d: values for d, values in filters.items() if values is not None and d in dimensions}
+        output = [d for d in (OUTPUT_DIMENSIONS[table] if output is None else output) if d in dimensions]
+        dated = 'month' in dimensions and (start_date is not None or end_date is not None)
+        cuboid = self.cuboid(table, set(applied) | set(output) | ({'month'} if dated else set()))
+
+        if applied or dated:
+            mask = np.ones(len(cuboid), dtype=bool)
+            for dimension, values in applied.items():
+                mask &= cuboid.index.get_level_values(dimension).isin(list(values))
+            if dated:
+                months = cuboid.index.get_level_values('month')
+                if start_date is not None:
+                    mask &= months >= pd.Timestamp(start_date).to_period('M').to_timestamp()
+                if end_date is not None:
+                    mask &= months <= pd.Timestamp(end_date).to_period('M').to_timestamp()
+            cuboid = cuboid[mask]
+
+        if output:
+            if set(cuboid.index.names) != set(output):
+                cuboid = cuboid.groupby(level=output, observed=True).sum()
+            return cuboid.reset_index()
+        return cuboid.sum().to_frame().T if len(cuboid) != 1 else cuboid.reset_index(drop=True)
+
+    def aggregates(self, regions: Optional[List[str]] = None, segments: Optional[List[str]] = None,
+                   channels: Optional[List[str]] = None, start_date=None, end_date=None) -> Dict[str, pd.DataFrame]:
+        # Same frames as DatabaseManager.get_kpi_aggregates, computed from the cuboids
+        filters = {'region': regions, 'segment': segments, 'channel': channels}
+        aggregates = {}
+        if 'revenue' in self.dimensions:
+            revenue = self._slice('revenue', filters, start_date, end_date)
+            aggregates['monthly_revenue'] = pd.DataFrame({
+                'month': month_labels(pd.DatetimeIndex(revenue['month'])) if 'month' in revenue else '',
+                'revenue': revenue['revenue'].to_numpy(),
+                'row_count': revenue['row_count'].to_numpy(dtype=np.int64)
+            })
+            if 'channel' in self.dimensions['revenue']:
+                by_channel = self._slice('revenue', filters, start_date, end_date, output=['channel'])
+                aggregates['channel_revenue'] = by_channel[['channel', 'revenue']]
+        if 'marketing' in self.dimensions:
+            spend = self._slice('marketing', filters, start_date, end_date)
+            aggregates['channel_spend'] = pd.DataFrame({
+                'month': month_labels(pd.DatetimeIndex(spend['month'])) if 'month' in spend else '',
+                'channel': spend['channel'].to_numpy() if 'channel' in spend else '',
+                'spend': spend['spend'].to_numpy(),
+                'row_count': spend['row_count'].to_numpy(dtype=np.int64)
+            })
+        if 'costs' in self.dimensions:
+            costs = self._slice('costs', filters, start_date, end_date)
+            aggregates['cost_totals'] = pd.DataFrame({
+                'month': month_labels(pd.DatetimeIndex(costs['month'])) if 'month' in costs else '',
+                'category': '',
+                'cost': costs['cost'].to_numpy(),
+                'row_count': costs['row_count'].to_numpy(dtype=np.int64)
+            })
+        if 'customers' in self.dimensions:
+            summary = self._slice('customers', filters, start_date, end_date)
+            counts = ['total_customers', *CUSTOMER_FLAGS] + [f'{m}_count' for m in CUSTOMER_MEASURES]
+            aggregates['customer_summary'] = summary.astype({c: np.int64 for c in counts})
+        return aggregates
+
+    def kpis(self, regions: Optional[List[str]] = None, segments: Optional[List[str]] = None,
+             channels: Optional[List[str]] = None, start_date=None, end_date=None) -> Dict[str, Dict[str, float]]:
+        try:
+            return self.calculator.generate_kpi_report_from_aggregates(
+                self.aggregates(regions, segments, channels, start_date, end_date)
+            )
+        except Exception as e:
+            self.logger.error(f'Error deriving KPIs from cube: {e}')
+            return {}
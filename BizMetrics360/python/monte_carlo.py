@@ -0,0 +1,232 @@
+# BizMetrics360 - Monte Carlo Revenue and Churn Risk
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+import pandas as pd
+import numpy as np
+from cohort_analysis import COHORT_COLUMNS, DAYS_PER_PERIOD
+from kpi_accumulator import to_month
+from kpi_calculator import KPICalculator
+
+SIMULATED_METRICS = ['revenue', 'gross_margin', 'clv_cac_ratio']
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def _monthly_totals(month_values: np.ndarray, weights, months: np.ndarray) -> np.ndarray:
+    # Sums per month in months (sorted datetime64[M]); values in other months are dropped
+    if not len(months):
+        return np.zeros(0)
+    positions = np.minimum(np.searchsorted(months, month_values), len(months) - 1)
+    known = months[positions] == month_values
+    weights = np.broadcast_to(np.asarray(weights, dtype=np.float64), month_values.shape)
+    return np.bincount(positions[known], weights=np.nan_to_num(weights[known]), minlength=len(months))
+
+
+def _beta_parameters(mean: float, variance: float) -> Tuple[float, float]:
+    # Method of moments; (0, 0) means the rate is held constant
+    if not 0 < mean < 1 or not 0 < variance < mean * (1 - mean):
+        return 0.0, 0.0
+    concentration = mean * (1 - mean) / variance - 1
+    return mean * concentration, (1 - mean) * concentration
+
+
+def fit_simulation_parameters(data_dict: Dict[str, pd.DataFrame],
+                              calculator: Optional[KPICalculator] = None) -> Dict[str, float]:
+    """Monthly distributions for the simulator, fitted from the KPI tables.
+
+    Revenue growth is the mean and spread of monthly log growth (a trailing
+    partial month is dropped). Churn is a per-month hazard from signups and
+    lifespans in the customer table, CAC the spread of monthly spend per new
+    customer, and the cost ratio costs / revenue per month. Baseline CLV and
+    CAC are the KPICalculator values.
+    """
+    calculator = calculator or KPICalculator()
+    revenue_data = data_dict['revenue']
+    monthly = calculator._monthly_revenue(revenue_data)
+    if len(monthly) > 2 and not pd.Timestamp(pd.to_datetime(revenue_data['date']).max()).is_month_end:
+        monthly = monthly.iloc[:-1]
+    months = monthly.index.values.astype('datetime64[M]')
+    revenue = monthly.to_numpy()
+    positive = revenue > 0
+    growth = np.diff(np.log(revenue[positive]))
+
+    customers = data_dict['customers']
+    column = next((c for c in COHORT_COLUMNS if c in customers.columns), None)
+    if column is None:
+        raise ValueError(f'Customer data needs one of {COHORT_COLUMNS}')
+    signup = to_month(customers[column])
+    known = ~np.isnat(signup)
+    lifespan_days = np.nan_to_num(customers['customer_lifespan_days'].to_numpy(dtype=np.float64))
+    lifespan = np.floor(lifespan_days / DAYS_PER_PERIOD).astype(np.int64)
+    churned = (customers['churned'] == True).to_numpy() & known
+    churn_month = signup[churned] + lifespan[churned]
+    new = (customers['is_new_customer'] == True).to_numpy() if 'is_new_customer' in customers.columns else known
+
+    # Customers active at the start of each month, and how many of them churned in it
+    joined = np.sort(signup[known])
+    left = np.sort(churn_month)
+    active = np.searchsorted(joined, months, side='left') - np.searchsorted(left, months, side='left')
+    churned_in = np.searchsorted(left, months, side='right') - np.searchsorted(left, months, side='left')
+    observed = active > 0
+    churn_rates = churned_in[observed] / active[observed]
+    # Exposure-weighted hazard over the whole table is steadier than the mean of monthly rates
+    exposure = np.sum(lifespan[known] + 1)
+    churn_mean = float(churned.sum() / exposure) if exposure else 0.0
+    churn_a, churn_b = _beta_parameters(churn_mean, float(np.var(churn_rates)) if len(churn_rates) > 1 else 0.0)
+
+    new_in = _monthly_totals(signup[new & known], 1.0, months)
+    acquisition_share = float(new_in.sum() / active[observed].sum()) if observed.any() else 0.0
+
+    log_cac_std = 0.0
+    if 'marketing' in data_dict:
+        marketing = data_dict['marketing']
+        month_column = 'month' if 'month' in marketing.columns else 'date'
+        spend = _monthly_totals(to_month(marketing[month_column]), marketing['spend'], months)
+        priced = (spend > 0) & (new_in > 0)
+        if priced.sum() > 1:
+            log_cac_std = float(np.std(np.log(spend[priced] / new_in[priced])))
+
+    cost_ratio_mean, cost_ratio_std = 0.0, 0.0
+    if 'costs' in data_dict:
+        costs = _monthly_totals(to_month(data_dict['costs']['date']), data_dict['costs']['cost'], months)
+        ratios = costs[positive] / revenue[positive]
+        cost_ratio_mean = float(ratios.mean()) if len(ratios) else 0.0
+        cost_ratio_std = float(ratios.std()) if len(ratios) > 1 else 0.0
+
+    cac_clv = (calculator.calculate_cac_clv_metrics(customers, data_dict['marketing'])
+               if 'marketing' in data_dict else {})
+    return {
+        'start_month': str(months[-1] + 1) if len(months) else '',
+        'base_revenue': float(revenue[-1]) if len(revenue) else 0.0,
+        'growth_mean': float(growth.mean()) if len(growth) else 0.0,
+        'growth_std': float(growth.std()) if len(growth) > 1 else 0.0,
+        'churn_mean': churn_mean,
+        'churn_a': churn_a,
+        'churn_b': churn_b,
+        'acquisition_share': acquisition_share,
+        'cac': float(cac_clv.get('cac', 0)),
+        'log_cac_std': log_cac_std,
+        'clv': float(cac_clv.get('clv', 0)),
+        'cost_ratio_mean': cost_ratio_mean,
+        'cost_ratio_std': cost_ratio_std
+    }
+
+
+def _simulate_chunk(params: Dict[str, float], horizon: int, paths: int,
+                    seed: np.random.SeedSequence) -> Dict[str, np.ndarray]:
+    # Worker entry point: one block of paths x months, returned as float32 to halve transfer and storage
+    rng = np.random.default_rng(seed)
+    shape = (paths, horizon)
+    churn_mean = params['churn_mean']
+    if params['churn_a'] > 0:
+        churn = rng.beta(params['churn_a'], params['churn_b'], shape)
+    else:
+        churn = np.full(shape, churn_mean)
+    # CAC relative to the baseline; cheaper months bring in more customers
+    cac_factor = np.exp(rng.normal(0.0, params['log_cac_std'], shape))
+    growth = rng.normal(params['growth_mean'], params['growth_std'], shape)
+    # Historical growth already reflects average churn and acquisition, so only deviations shift it
+    growth += (churn_mean - churn) + params['acquisition_share'] * (1 / cac_factor - 1)
+    revenue = params['base_revenue'] * np.exp(np.cumsum(growth, axis=1))
+    cost_ratio = np.maximum(rng.normal(params['cost_ratio_mean'], params['cost_ratio_std'], shape), 0)
+
+    # Lifetime follows the path's average churn so far; CAC is spend over customers acquired so far
+    months = np.arange(1, horizon + 1)
+    running_churn = np.cumsum(churn, axis=1) / months
+    running_cac = params['cac'] * months / np.cumsum(1 / cac_factor, axis=1)
+    clv = params['clv'] * np.divide(churn_mean, running_churn, out=np.ones(shape), where=running_churn > 0)
+    clv_cac = np.divide(clv, running_cac, out=np.full(shape, np.nan), where=running_cac > 0)
+
+    total_revenue = revenue.sum(axis=1)
+    total_costs = (revenue * cost_ratio).sum(axis=1)
+    return {
+        'revenue': revenue.astype(np.float32),
+        'gross_margin': ((1 - cost_ratio) * 100).astype(np.float32),
+        'clv_cac_ratio': clv_cac.astype(np.float32),
+        'total_revenue': total_revenue,
+        'horizon_gross_margin': np.divide(total_revenue - total_costs, total_revenue,
+                                          out=np.zeros(paths), where=total_revenue > 0) * 100
+    }
+
+
+class MonteCarloSimulator:
+    """Samples future months of revenue, churn and marketing efficiency.
+
+    Paths are simulated in blocks of chunk_size, so temporary arrays stay
+    bounded; each block gets its own child of one SeedSequence, which makes
+    results depend only on the seed and chunk_size, not on max_workers.
+    With max_workers > 1 blocks run in a process pool.
+    """
+
+    def __init__(self, params: Dict[str, float], horizon: int = 24, chunk_size: int = 20000,
+                 max_workers: Optional[int] = 1):
+        self.params = params
+        self.horizon = horizon
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def from_data(cls, data_dict: Dict[str, pd.DataFrame], calculator: Optional[KPICalculator] = None,
+                  **kwargs) -> 'MonteCarloSimulator':
+        return cls(fit_simulation_parameters(data_dict, calculator), **kwargs)
+
+    def _chunks(self, paths: int, seed: Optional[int]) -> List[Tuple[int, np.random.SeedSequence]]:
+        sizes = [min(self.chunk_size, paths - start) for start in range(0, paths, self.chunk_size)]
+        return list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+
+    def simulate(self, paths: int = 100000, seed: Optional[int] = None) -> Dict[str, np.ndarray]:
+        # Every simulated path, (paths, horizon) per monthly metric and (paths,) for horizon totals
+        chunks = self._chunks(paths, seed)
+        results = {}
+        args = [(self.params, self.horizon, size, child) for size, child in chunks]
+        if self.max_workers == 1 or len(chunks) <= 1:
+            blocks = (_simulate_chunk(*task) for task in args)
+            self._collect(results, blocks, paths)
+            return results
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            blocks = executor.map(_simulate_chunk, *zip(*args))
+            self._collect(results, blocks, paths)
+        return results
+
+    def _collect(self, results: Dict[str, np.ndarray], blocks: Iterable[Dict[str, np.ndarray]], paths: int):
+        # Blocks are copied into preallocated arrays as they arrive
+        start = 0
+        for block in blocks:
+            size = len(block['total_revenue'])
+            for name, values in block.items():
+                if name not in results:
+                    results[name] = np.empty((paths,) + values.shape[1:], dtype=values.dtype)
+                results[name][start:start + size] = values
+            start += size
+
+    def percentile_bands(self, paths: int = 100000, seed: Optional[int] = None,
+                         percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> Dict[str, pd.DataFrame]:
+        try:
+            percentiles = list(percentiles)
+            simulated = self.simulate(paths, seed)
+            start = np.datetime64(self.params['start_month'], 'M') if self.params['start_month'] else None
+            months = ([str(start + offset) for offset in range(self.horizon)] if start is not None
+                      else list(range(1, self.horizon + 1)))
+
+            bands = []
+            for metric in SIMULATED_METRICS:
+                values = simulated[metric]
+                band = pd.DataFrame(np.nanpercentile(values, percentiles, axis=0).T,
+                                    columns=[f'p{q:g}' for q in percentiles])
+                band.insert(0, 'month', months)
+                band.insert(0, 'metric', metric)
+                band['mean'] = np.nanmean(values, axis=0)
+                bands.append(band)
+
+            summary = pd.DataFrame({
+                metric: np.nanpercentile(simulated[metric], percentiles)
+                for metric in ('total_revenue', 'horizon_gross_margin')
+            }, index=pd.Index([f'p{q:g}' for q in percentiles], name='percentile'))
+            summary['final_clv_cac_ratio'] = np.nanpercentile(simulated['clv_cac_ratio'][:, -1], percentiles)
+            return {'bands': pd.concat(bands, ignore_index=True), 'summary': summary}
+        except Exception as e:
+            self.logger.error(f'Error running Monte Carlo simulation: {e}')
+            return {}
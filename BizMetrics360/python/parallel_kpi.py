@@ -0,0 +1,110 @@
+# BizMetrics360 - Partition-Parallel KPI Computation
+import os
+import logging
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+from database_manager import DATE_COLUMNS, TABLES
+from kpi_accumulator import KPIAccumulator
+from kpi_calculator import KPICalculator
+from storage_backends import KPI_COLUMNS, ParquetBackend
+
+# Tasks per worker, so one large month does not leave the other workers idle
+TASKS_PER_WORKER = 4
+
+
+def _accumulate_files(root_dir: str, table: str, files: List[str], chunksize: int, start_date=None,
+                      end_date=None, regions: Optional[List[str]] = None) -> KPIAccumulator:
+    # Worker entry point: reads its own partition files and returns only sums and counts
+    backend = ParquetBackend(root_dir)
+    filters = {'region': regions} if table in ('revenue', 'customers') else None
+    accumulator = KPIAccumulator()
+    for chunk in backend.iter_files(table, files, chunksize, KPI_COLUMNS[table], start_date, end_date, filters):
+        accumulator.add(table, chunk)
+    accumulator.tables.add(table)
+    return accumulator
+
+
+def plan_tasks(backend: ParquetBackend, num_tasks: int, start_date=None,
+               end_date=None) -> List[Tuple[str, List[str]]]:
+    """Split the month partitions of every table into (table, files) tasks.
+
+    Files are dealt largest first onto the task with the fewest bytes, so
+    tasks carry roughly equal amounts of data.
+    """
+    tasks = []
+    for table in TABLES:
+        files = backend.partition_files(table, start_date, end_date)
+        if not files:
+            continue
+        buckets = [[0, []] for _ in range(min(num_tasks, len(files)))]
+        for path in sorted(files, key=os.path.getsize, reverse=True):
+            bucket = min(buckets, key=lambda b: b[0])
+            bucket[0] += os.path.getsize(path)
+            bucket[1].append(path)
+        tasks.extend((table, sorted(bucket[1])) for bucket in buckets)
+    return tasks
+
+
+class ParallelKPIRunner:
+    """Computes the KPI report across a process pool.
+
+    Workers are handed Parquet partition file paths rather than pickled
+    DataFrames, fold them into KPIAccumulators and send back only the
+    partial sums, which are merged into the usual report. In-memory frames
+    are first spilled to a temporary month-partitioned warehouse.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, calculator: Optional[KPICalculator] = None,
+                 chunksize: int = 500000):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.calculator = calculator or KPICalculator()
+        self.chunksize = chunksize
+        self.logger = logging.getLogger(__name__)
+
+    def accumulate(self, backend: ParquetBackend, start_date=None, end_date=None,
+                   regions: Optional[List[str]] = None) -> KPIAccumulator:
+        tasks = plan_tasks(backend, self.max_workers * TASKS_PER_WORKER, start_date, end_date)
+        args = [(backend.root_dir, table, files, self.chunksize, start_date, end_date, regions)
+                for table, files in tasks]
+        merged = KPIAccumulator()
+        if self.max_workers == 1 or len(tasks) <= 1:
+            for task in args:
+                merged.merge(_accumulate_files(*task))
+            return merged
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(_accumulate_files, *task) for task in args]
+            for future in futures:
+                merged.merge(future.result())
+        return merged
+
+    def generate_kpi_report(self, backend: ParquetBackend, start_date=None, end_date=None,
+                            regions: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+        try:
+            accumulator = self.accumulate(backend, start_date, end_date, regions)
+            return self.calculator.generate_kpi_report_from_aggregates(accumulator.to_aggregates())
+        except Exception as e:
+            self.logger.error(f'Error generating parallel KPI report: {e}')
+            return {}
+
+    def generate_kpi_report_from_frames(self, data_dict: Dict[str, pd.DataFrame]) -> Dict[str, Dict[str, float]]:
+        try:
+            with tempfile.TemporaryDirectory(prefix='bizmetrics360-') as root_dir:
+                backend = ParquetBackend(root_dir)
+                for table, frame in data_dict.items():
+                    if table in TABLES:
+                        columns = dict.fromkeys(KPI_COLUMNS[table] + [DATE_COLUMNS[table]])
+                        backend.write_table(table, frame[[c for c in columns if c in frame.columns]])
+                report = self.generate_kpi_report(backend)
+            # Channel ROI needs revenue_by_channel, which is not a warehouse table; same as KPICalculator
+            report.pop('roi_channels', None)
+            if report and 'marketing' in data_dict and 'revenue' in data_dict:
+                report['roi_channels'] = self.calculator.calculate_roi_by_channel(
+                    data_dict['marketing'], data_dict.get('revenue_by_channel', data_dict['revenue'])
+                )
+            return report
+        except Exception as e:
+            self.logger.error(f'Error generating parallel KPI report: {e}')
+            return {}
@@ -0,0 +1,176 @@
+# BizMetrics360 - Date-Range KPI Index
+import logging
+import pandas as pd
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from cohort_analysis import COHORT_COLUMNS
+from kpi_accumulator import dimension_codes, to_day
+from kpi_calculator import KPICalculator
+
+# Optional marketing counters, indexed when the column is present
+MARKETING_COUNTERS = ['clicks', 'impressions', 'conversions']
+
+
+class KPIRangeIndex:
+    """Daily prefix sums of the additive KPI components.
+
+    Each event series (revenue, costs, marketing, customer signups and
+    churn) keeps its sorted distinct days and a cumulative sum per measure,
+    region and day, plus an all-regions row. Any [start, end] total is two
+    searchsorted calls and a subtraction, independent of history length.
+
+    Regions only filter series that carry a region column, as with
+    KPICube; a customer churns on signup_date + customer_lifespan_days.
+
+    Rows are placed on the day their date column names. Marketing 'YYYY-MM'
+    months and customer cohort_month fall on the first of the month, so a
+    range counts a month's spend and signups in full when it contains the
+    1st and not at all otherwise; month-aligned ranges are exact.
+    """
+
+    def __init__(self, calculator: Optional[KPICalculator] = None):
+        self.logger = logging.getLogger(__name__)
+        self.calculator = calculator or KPICalculator()
+        self._series: Dict[str, Tuple[np.ndarray, Dict[str, int], List[str], np.ndarray]] = {}
+
+    @classmethod
+    def from_data(cls, data_dict: Dict[str, pd.DataFrame],
+                  calculator: Optional[KPICalculator] = None) -> 'KPIRangeIndex':
+        index = cls(calculator)
+        if 'revenue' in data_dict:
+            revenue = data_dict['revenue']
+            index.add_series('revenue', to_day(revenue['date']), revenue.get('region'), {
+                'revenue': revenue['revenue'].to_numpy(dtype=np.float64),
+                'revenue_rows': revenue['revenue'].notna().to_numpy(dtype=np.float64)
+            })
+        if 'costs' in data_dict:
+            costs = data_dict['costs']
+            index.add_series('costs', to_day(costs['date']), costs.get('region'),
+                             {'cost': costs['cost'].to_numpy(dtype=np.float64)})
+        if 'marketing' in data_dict:
+            marketing = data_dict['marketing']
+            month_column = 'date' if 'date' in marketing.columns else 'month'
+            measures = {'spend': marketing['spend'].to_numpy(dtype=np.float64)}
+            for counter in MARKETING_COUNTERS:
+                if counter in marketing.columns:
+                    measures[counter] = marketing[counter].to_numpy(dtype=np.float64)
+            index.add_series('marketing', to_day(marketing[month_column]), None, measures)
+        if 'customers' in data_dict:
+            index.add_customers(data_dict['customers'])
+        return index
+
+    def add_customers(self, customer_data: pd.DataFrame):
+        column = next((c for c in COHORT_COLUMNS if c in customer_data.columns), None)
+        if column is None:
+            # Without signup dates customer counts cannot be placed in time
+            self.logger.debug('Customer data has no signup dates; range customer KPIs unavailable')
+            return
+        signup = to_day(customer_data[column])
+        region = customer_data.get('region')
+        new = ((customer_data['is_new_customer'] == True).to_numpy(dtype=np.float64)
+               if 'is_new_customer' in customer_data.columns else np.ones(len(customer_data)))
+        self.add_series('signups', signup, region, {'signups': np.ones(len(customer_data)), 'new_customers': new})
+
+        if 'churned' in customer_data.columns and 'customer_lifespan_days' in customer_data.columns:
+            churned = (customer_data['churned'] == True).to_numpy()
+            lifespan = np.nan_to_num(customer_data['customer_lifespan_days'].to_numpy(dtype=np.float64))
+            churn_day = signup + lifespan.astype(np.int64).astype('timedelta64[D]')
+            self.add_series('churn', churn_day[churned], None if region is None else region[churned],
+                            {'churned_customers': np.ones(int(churned.sum()))})
+
+    def add_series(self, name: str, days: np.ndarray, regions: Optional[pd.Series],
+                   measures: Dict[str, np.ndarray]):
+        known = ~np.isnat(days)
+        distinct, day_codes = np.unique(days[known], return_inverse=True)
+        if regions is not None:
+            region_codes, labels = dimension_codes(regions.reset_index(drop=True)[known])
+            lookup = {str(label): row for row, label in enumerate(labels)}
+            # Rows with a missing region get their own row so they still count in the totals
+            region_codes = np.where(region_codes >= 0, region_codes, len(labels))
+            rows = len(labels) + 1
+        else:
+            lookup, region_codes, rows = {}, np.zeros(len(day_codes), dtype=np.int64), 1
+
+        flat = region_codes * len(distinct) + day_codes
+        # (measure, region rows + all-regions row, leading zero + days)
+        cube = np.zeros((len(measures), rows + 1, len(distinct) + 1))
+        for position, values in enumerate(measures.values()):
+            cube[position, :rows, 1:] = np.bincount(
+                flat, weights=np.nan_to_num(values[known]), minlength=rows * len(distinct)
+            ).reshape(rows, len(distinct))
+        cube[:, rows] = cube[:, :rows].sum(axis=1)
+        np.cumsum(cube, axis=2, out=cube)
+        lookup[None] = rows
+        self._series[name] = (distinct, lookup, list(measures), cube)
+
+    def _window(self, name: str, start_date=None, end_date=None,
+                regions: Optional[List[str]] = None) -> Tuple[Dict[str, float], Dict[str, float]]:
+        # (sums before start_date, sums within [start_date, end_date]) per measure
+        days, lookup, measures, cube = self._series[name]
+        lo = np.searchsorted(days, np.datetime64(start_date, 'D'), side='left') if start_date is not None else 0
+        hi = np.searchsorted(days, np.datetime64(end_date, 'D'), side='right') if end_date is not None else len(days)
+        hi = max(hi, lo)
+        if regions is None or len(lookup) == 1:
+            rows = [lookup[None]]
+        else:
+            rows = [lookup[str(region)] for region in regions if str(region) in lookup]
+        before = cube[:, rows, lo].sum(axis=1)
+        within = cube[:, rows, hi].sum(axis=1) - before
+        return dict(zip(measures, before)), dict(zip(measures, within))
+
+    def date_bounds(self) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+        # First and last day with revenue, costs, spend or signups (churn days run ahead into
+        # lifespans); the default range for date pickers, over which the totals match the full report
+        days = [self._series[name][0] for name in ('revenue', 'costs', 'marketing', 'signups')
+                if name in self._series and len(self._series[name][0])]
+        if not days:
+            return None, None
+        return pd.Timestamp(min(d[0] for d in days)), pd.Timestamp(max(d[-1] for d in days))
+
+    def totals(self, start_date=None, end_date=None, regions: Optional[List[str]] = None) -> Dict[str, float]:
+        totals = {}
+        for name in self._series:
+            totals.update(self._window(name, start_date, end_date, regions)[1])
+        return totals
+
+    def kpis(self, start_date=None, end_date=None, regions: Optional[List[str]] = None) -> Dict[str, float]:
+        # KPIs of the inclusive [start_date, end_date] range; only sections with indexed data are present
+        try:
+            kpis = {}
+            if 'revenue' in self._series:
+                revenue = self._window('revenue', start_date, end_date, regions)[1]
+                kpis['total_revenue'] = float(revenue['revenue'])
+                kpis['revenue_rows'] = int(revenue['revenue_rows'])
+            if 'revenue' in self._series and 'costs' in self._series:
+                costs = self._window('costs', start_date, end_date, regions)[1]
+                margin = self.calculator._gross_margin_from_totals(kpis['total_revenue'], costs['cost'])
+                kpis.update({'total_costs': margin['total_costs'], 'gross_profit': margin['gross_profit'],
+                             'gross_margin': margin['gross_margin']})
+            if 'marketing' in self._series:
+                marketing = self._window('marketing', start_date, end_date)[1]
+                spend = float(marketing['spend'])
+                kpis['total_marketing_spend'] = spend
+                if 'clicks' in marketing:
+                    clicks = marketing['clicks']
+                    kpis['clicks'] = int(clicks)
+                    kpis['cpc'] = spend / clicks if clicks > 0 else 0.0
+                    if 'impressions' in marketing:
+                        kpis['ctr'] = clicks / marketing['impressions'] * 100 if marketing['impressions'] > 0 else 0.0
+                    if 'conversions' in marketing:
+                        kpis['conversion_rate'] = marketing['conversions'] / clicks * 100 if clicks > 0 else 0.0
+            if 'signups' in self._series:
+                signups_before, signups = self._window('signups', start_date, end_date, regions)
+                kpis['new_customers'] = int(signups['new_customers'])
+                if 'marketing' in self._series:
+                    new = signups['new_customers']
+                    kpis['cac'] = kpis['total_marketing_spend'] / new if new > 0 else 0.0
+                if 'churn' in self._series:
+                    churn_before, churn = self._window('churn', start_date, end_date, regions)
+                    # Churned in the range over everyone active at some point in it
+                    exposed = signups_before['signups'] - churn_before['churned_customers'] + signups['signups']
+                    kpis['churned_customers'] = int(churn['churned_customers'])
+                    kpis['churn_rate'] = churn['churned_customers'] / exposed * 100 if exposed > 0 else 0.0
+            return kpis
+        except Exception as e:
+            self.logger.error(f'Error computing date-range KPIs: {e}')
+            return {}
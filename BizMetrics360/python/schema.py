@@ -0,0 +1,89 @@
+# BizMetrics360 - Shared Frame Schema
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+REGIONS = ['North', 'South', 'East', 'West']
+PRODUCT_CATEGORIES = ['Software', 'Services', 'Hardware', 'Consulting']
+SEGMENTS = ['Enterprise', 'SMB', 'Startup']
+CHANNELS = ['Google Ads', 'Facebook Ads', 'LinkedIn Ads', 'Email Marketing', 'Content Marketing']
+COST_CATEGORIES = ['COGS', 'Marketing', 'Sales', 'R&D', 'Operations']
+
+# Fixed category order per dimension column. Frames whose values stay within the
+# lists share one dtype; values outside a list are appended after it (sorted) per
+# frame, so such frames can differ and pd.concat of them falls back to object.
+CATEGORIES: Dict[str, List[str]] = {
+    'region': REGIONS,
+    'product_category': PRODUCT_CATEGORIES,
+    'segment': SEGMENTS,
+    'channel': CHANNELS,
+    'category': COST_CATEGORIES,
+    'company_size': ['Startup', 'SMB', 'Enterprise', 'Government'],
+    'cost_type': ['COGS', 'Operating Expenses', 'Marketing', 'R&D', 'Administrative'],
+    'department': ['Sales', 'Marketing', 'Engineering', 'Support', 'Finance']
+}
+
+FLAG_COLUMNS = ['is_new_customer', 'is_active', 'churned']
+
+# Row ids are compared against SQLite watermarks, so they keep their width
+KEEP_COLUMNS = ['id']
+
+INT32 = np.iinfo(np.int32)
+
+
+def category_dtype(column: str, values=None) -> pd.CategoricalDtype:
+    # Unknown values are kept rather than dropped; the dashboards use their own regions and channels
+    categories = list(CATEGORIES[column])
+    if values is not None:
+        known = set(categories)
+        extras = {value for value in pd.unique(values) if pd.notna(value) and value not in known}
+        categories.extend(sorted(extras, key=str))
+    return pd.CategoricalDtype(categories)
+
+
+def to_category(values: pd.Series, column: str) -> pd.Series:
+    dtype = category_dtype(column, values)
+    if values.dtype == dtype:
+        return values
+    return values.astype(dtype)
+
+
+def to_flag(values: pd.Series) -> pd.Series:
+    if values.dtype == bool:
+        return values
+    present = values.dropna()
+    if not present.isin([0, 1]).all():
+        return values
+    # Nullable boolean only when there is something missing to represent
+    return values.astype('boolean' if len(present) < len(values) else bool)
+
+
+def downcast_numeric(values: pd.Series) -> pd.Series:
+    kind = values.dtype.kind
+    if kind in 'iu' and values.dtype.itemsize > 4:
+        if values.empty or (values.min() >= INT32.min and values.max() <= INT32.max):
+            return values.astype(np.int32)
+    elif kind == 'f' and values.dtype.itemsize > 4:
+        narrowed = values.astype(np.float32)
+        # Only when lossless, so the sums and means behind the KPIs do not move
+        if np.array_equal(narrowed.to_numpy(dtype=np.float64), values.to_numpy(), equal_nan=True):
+            return narrowed
+    return values
+
+
+def normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Category dtype for dimensions, bool flags and int32/float32 where lossless."""
+    normalized = df.copy(deep=False)
+    for column in df.columns:
+        values = df[column]
+        if column in KEEP_COLUMNS:
+            continue
+        if column in CATEGORIES:
+            converted = to_category(values, column)
+        elif column in FLAG_COLUMNS:
+            converted = to_flag(values)
+        else:
+            converted = downcast_numeric(values)
+        if converted is not values:
+            normalized[column] = converted
+    return normalized
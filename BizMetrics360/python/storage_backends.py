@@ -0,0 +1,525 @@
+# BizMetrics360 - Storage Backends
+import codecs
+import glob
+import os
+import time
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+import yaml
+from connection_pool import ConnectionPool
+from database_manager import DatabaseManager, DATE_COLUMNS, INDEXES, MONTH_COLUMNS, TABLES
+from kpi_accumulator import to_month
+
+SETTINGS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'settings.yaml')
+
+# Columns KPICalculator needs from each table
+KPI_COLUMNS = {
+    'revenue': ['date', 'revenue'],
+    'customers': ['is_new_customer', 'is_active', 'churned', 'total_spent', 'purchase_count',
+                  'customer_lifespan_days'],
+    'marketing': ['month', 'channel', 'spend'],
+    'costs': ['date', 'category', 'cost']
+}
+
+# Column layout of CompactSQLiteBackend: (column, encoding, declared SQLite type).
+# 'day' is epoch days, 'month' is months since 1970-01, 'dimension' a dim_<column> code.
+COMPACT_SCHEMA = {
+    'revenue': [
+        ('date', 'day', 'INTEGER NOT NULL'),
+        ('revenue', 'value', 'REAL NOT NULL'),
+        ('region', 'dimension', 'INTEGER'),
+        ('product_category', 'dimension', 'INTEGER')
+    ],
+    'customers': [
+        ('customer_id', 'value', 'TEXT UNIQUE NOT NULL'),
+        ('is_new_customer', 'flag', 'INTEGER'),
+        ('is_active', 'flag', 'INTEGER'),
+        ('churned', 'flag', 'INTEGER'),
+        ('total_spent', 'value', 'REAL'),
+        ('purchase_count', 'value', 'INTEGER'),
+        ('customer_lifespan_days', 'value', 'REAL'),
+        ('cohort_month', 'month', 'INTEGER'),
+        ('region', 'dimension', 'INTEGER'),
+        ('segment', 'dimension', 'INTEGER')
+    ],
+    'marketing': [
+        ('month', 'month', 'INTEGER NOT NULL'),
+        ('channel', 'dimension', 'INTEGER NOT NULL'),
+        ('spend', 'value', 'REAL NOT NULL')
+    ],
+    'costs': [
+        ('date', 'day', 'INTEGER NOT NULL'),
+        ('category', 'dimension', 'INTEGER NOT NULL'),
+        ('cost', 'value', 'REAL NOT NULL')
+    ]
+}
+
+# Partition for rows without a date; only read when no date range is given
+UNKNOWN_PERIOD = 'unknown'
+
+
+class StorageBackend(ABC):
+    """Table storage for the KPI pipeline.
+
+    Readers take the same arguments as DatabaseManager: an optional column
+    projection, an inclusive date range on the table's date column and
+    {column: values} equality filters.
+    """
+
+    @abstractmethod
+    def write_table(self, table: str, data: Union[pd.DataFrame, Iterable[pd.DataFrame]]) -> Dict[str, float]:
+        pass
+
+    @abstractmethod
+    def read_table(self, table: str, columns: Optional[List[str]] = None, start_date=None, end_date=None,
+                   filters: Optional[Dict[str, Optional[List[str]]]] = None) -> pd.DataFrame:
+        pass
+
+    @abstractmethod
+    def iter_table(self, table: str, chunksize: int = 100000, columns: Optional[List[str]] = None,
+                   start_date=None, end_date=None,
+                   filters: Optional[Dict[str, Optional[List[str]]]] = None) -> Iterator[pd.DataFrame]:
+        pass
+
+    def get_all_data(self, start_date=None, end_date=None,
+                     regions: Optional[List[str]] = None) -> Dict[str, pd.DataFrame]:
+        return {
+            'revenue': self.read_table('revenue', None, start_date, end_date, {'region': regions}),
+            'customers': self.read_table('customers', None, start_date, end_date, {'region': regions}),
+            'marketing': self.read_table('marketing', None, start_date, end_date),
+            'costs': self.read_table('costs', None, start_date, end_date)
+        }
+
+    def iter_kpi_chunks(self, chunksize: int = 100000, start_date=None, end_date=None,
+                        regions: Optional[List[str]] = None) -> Dict[str, Iterator[pd.DataFrame]]:
+        # Projected to KPI_COLUMNS, for KPICalculator.generate_kpi_report_streaming
+        return {
+            table: self.iter_table(table, chunksize, KPI_COLUMNS[table], start_date, end_date,
+                                   {'region': regions} if table in ('revenue', 'customers') else None)
+            for table in TABLES
+        }
+
+    def close(self):
+        pass
+
+
+class SQLiteBackend(StorageBackend):
+    def __init__(self, db_manager: Optional[DatabaseManager] = None, db_path: str = 'bizmetrics360.db'):
+        self._owns_db = db_manager is None
+        self.db = db_manager or DatabaseManager(db_path)
+
+    def write_table(self, table: str, data: Union[pd.DataFrame, Iterable[pd.DataFrame]]) -> Dict[str, float]:
+        return self.db.bulk_insert(table, data)
+
+    def read_table(self, table: str, columns: Optional[List[str]] = None, start_date=None, end_date=None,
+                   filters: Optional[Dict[str, Optional[List[str]]]] = None) -> pd.DataFrame:
+        return self.db.read_table(table, columns, start_date, end_date, filters)
+
+    def iter_table(self, table: str, chunksize: int = 100000, columns: Optional[List[str]] = None,
+                   start_date=None, end_date=None,
+                   filters: Optional[Dict[str, Optional[List[str]]]] = None) -> Iterator[pd.DataFrame]:
+        return self.db.iter_table(table, chunksize, columns, start_date, end_date, filters)
+
+    def close(self):
+        if self._owns_db:
+            self.db.close()
+
+
+class ParquetBackend(StorageBackend):
+    """Columnar storage as month-partitioned Parquet files.
+
+    Layout is <root>/<table>/period=YYYY-MM/part-N.parquet, the same one
+    data/build_dataset.py writes. Reads skip partitions outside the date
+    range without opening them and only decode the requested columns.
+    """
+
+    def __init__(self, root_dir: str = os.path.join('data', 'warehouse')):
+        self.root_dir = root_dir
+        self.logger = logging.getLogger(__name__)
+
+    def _check_table(self, table: str):
+        if table not in TABLES:
+            raise ValueError(f'Unknown table: {table}')
+
+    def _periods(self, table: str, chunk: pd.DataFrame) -> pd.Series:
+        column = DATE_COLUMNS[table]
+        if column not in chunk.columns:
+            return pd.Series(UNKNOWN_PERIOD, index=chunk.index)
+        if column in MONTH_COLUMNS:
+            periods = chunk[column].astype('string').str[:7]
+        else:
+            periods = chunk[column].dt.strftime('%Y-%m')
+        return periods.fillna(UNKNOWN_PERIOD)
+
+    def write_table(self, table: str, data: Union[pd.DataFrame, Iterable[pd.DataFrame]]) -> Dict[str, float]:
+        # Appends: each call adds one new part file per month it touches
+        self._check_table(table)
+        chunks = [data] if isinstance(data, pd.DataFrame) else data
+        rows = 0
+        started = time.perf_counter()
+        try:
+            for chunk in chunks:
+                column = DATE_COLUMNS[table]
+                if column in chunk.columns and column not in MONTH_COLUMNS:
+                    # Stored as timestamps so date filters compare natively
+                    chunk = chunk.assign(**{column: pd.to_datetime(chunk[column])})
+                for period, part in chunk.groupby(self._periods(table, chunk), sort=True):
+                    partition_dir = os.path.join(self.root_dir, table, f'period={period}')
+                    os.makedirs(partition_dir, exist_ok=True)
+                    part_number = len(glob.glob(os.path.join(partition_dir, '*.parquet')))
+                    part.to_parquet(os.path.join(partition_dir, f'part-{part_number}.parquet'), index=False)
+                    rows += len(part)
+        except Exception as e:
+            self.logger.error(f'Error writing {table} data: {e}')
+
+        seconds = time.perf_counter() - started
+        rows_per_sec = rows / seconds if seconds > 0 else 0.0
+        self.logger.info(f'Wrote {rows} {table} records ({rows_per_sec:,.0f} rows/sec)')
+        return {'rows': rows, 'seconds': seconds, 'rows_per_sec': rows_per_sec}
+
+    def _partition_files(self, table: str, start_date=None, end_date=None) -> List[str]:
+        # Partition pruning: month directories outside [start, end] are never listed
+        table_dir = os.path.join(self.root_dir, table)
+        if not os.path.isdir(table_dir):
+            return []
+        start = pd.Timestamp(start_date).strftime('%Y-%m') if start_date is not None else None
+        end = pd.Timestamp(end_date).strftime('%Y-%m') if end_date is not None else None
+
+        files = []
+        for name in sorted(os.listdir(table_dir)):
+            if not name.startswith('period='):
+                continue
+            period = name[len('period='):]
+            if period == UNKNOWN_PERIOD:
+                if start is not None or end is not None:
+                    continue
+            elif (start is not None and period < start) or (end is not None and period > end):
+                continue
+            files.extend(sorted(glob.glob(os.path.join(table_dir, name, '*.parquet'))))
+        return files
+
+    def _filter_expression(self, table: str, names: List[str], start_date=None, end_date=None,
+                           filters: Optional[Dict[str, Optional[List[str]]]] = None):
+        # Row-level filter for the boundary months plus equality filters
+        expressions = []
+        column = DATE_COLUMNS[table]
+        if column in MONTH_COLUMNS:
+            if start_date is not None:
+                expressions.append(ds.field(column) >= pd.Timestamp(start_date).strftime('%Y-%m'))
+            if end_date is not None:
+                expressions.append(ds.field(column) <= pd.Timestamp(end_date).strftime('%Y-%m'))
+        else:
+            if start_date is not None:
+                expressions.append(ds.field(column) >= pd.Timestamp(start_date).normalize())
+            if end_date is not None:
+                expressions.append(ds.field(column) < pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1))
+
+        for name, values in (filters or {}).items():
+            if values is None:
+                continue
+            if name not in names:
+                raise ValueError(f'Unknown filter column for {table}: {name}')
+            expressions.append(ds.field(name).isin(list(values)))
+
+        expression = None
+        for item in expressions:
+            expression = item if expression is None else expression & item
+        return expression
+
+    def _scanner(self, table: str, columns: Optional[List[str]], start_date, end_date,
+                 filters: Optional[Dict[str, Optional[List[str]]]], batch_size: int = 131072,
+                 files: Optional[List[str]] = None):
+        self._check_table(table)
+        if files is None:
+            files = self._partition_files(table, start_date, end_date)
+        if not files:
+            return None
+        dataset = ds.dataset(files, format='parquet')
+        names = dataset.schema.names
+        if columns:
+            unknown = [c for c in columns if c not in names]
+            if unknown:
+                raise ValueError(f'Unknown columns for {table}: {unknown}')
+        return dataset.scanner(
+            columns=columns or names,
+            filter=self._filter_expression(table, names, start_date, end_date, filters),
+            batch_size=batch_size
+        )
+
+    def read_table(self, table: str, columns: Optional[List[str]] = None, start_date=None, end_date=None,
+                   filters: Optional[Dict[str, Optional[List[str]]]] = None) -> pd.DataFrame:
+        try:
+            scanner = self._scanner(table, columns, start_date, end_date, filters)
+            if scanner is None:
+                return pd.DataFrame(columns=columns or [])
+            return scanner.to_table().to_pandas()
+        except Exception as e:
+            self.logger.error(f'Error retrieving {table} data: {e}')
+            return pd.DataFrame()
+
+    def iter_table(self, table: str, chunksize: int = 100000, columns: Optional[List[str]] = None,
+                   start_date=None, end_date=None,
+                   filters: Optional[Dict[str, Optional[List[str]]]] = None) -> Iterator[pd.DataFrame]:
+        return self.iter_files(table, None, chunksize, columns, start_date, end_date, filters)
+
+    def partition_files(self, table: str, start_date=None, end_date=None) -> List[str]:
+        self._check_table(table)
+        return self._partition_files(table, start_date, end_date)
+
+    def iter_files(self, table: str, files: Optional[List[str]], chunksize: int = 100000,
+                   columns: Optional[List[str]] = None, start_date=None, end_date=None,
+                   filters: Optional[Dict[str, Optional[List[str]]]] = None) -> Iterator[pd.DataFrame]:
+        # Like iter_table over a subset of partition_files(), e.g. one worker's share
+        try:
+            scanner = self._scanner(table, columns, start_date, end_date, filters, batch_size=chunksize,
+                                    files=files)
+            if scanner is None:
+                return
+            for batch in scanner.to_batches():
+                if batch.num_rows:
+                    yield batch.to_pandas()
+        except Exception as e:
+            self.logger.error(f'Error streaming {table} data: {e}')
+
+
+class CompactSQLiteBackend(StorageBackend):
+    """SQLite with an integer-encoded schema.
+
+    Dates are stored as epoch days and 'YYYY-MM' months as months since
+    1970-01, low-cardinality dimensions as codes into dim_<column> lookup
+    tables. Column names match DatabaseManager, and loaders decode straight
+    to datetime64, Categorical and bool columns, so nothing is re-parsed
+    downstream.
+    """
+
+    def __init__(self, db_path: str = 'bizmetrics360_compact.db', pragmas: Optional[Dict[str, object]] = None):
+        self.db_path = db_path
+        self.logger = logging.getLogger(__name__)
+        self.pool = ConnectionPool(db_path, pragmas)
+        self._categories: Dict[str, List[str]] = {}
+        self.init_database()
+
+    def _check_schema(self, conn):
+        # CREATE TABLE IF NOT EXISTS would silently reuse e.g. a DatabaseManager database with TEXT dates
+        for table, schema in COMPACT_SCHEMA.items():
+            info = conn.execute(f'PRAGMA table_info({table})').fetchall()
+            existing = [(name, declared.upper()) for _, name, declared, *_ in info]
+            expected = [('id', 'INTEGER')] + [(column, declared.split()[0]) for column, _, declared in schema]
+            if existing and existing != expected:
+                raise ValueError(f'{self.db_path} has a {table} table that does not match the compact schema; '
+                                 f'point database.compact_path at a separate file')
+
+    def init_database(self):
+        with self.pool.writer() as conn:
+            self._check_schema(conn)
+        try:
+            with self.pool.writer() as conn:
+                for dimension in sorted({c for s in COMPACT_SCHEMA.values() for c, k, _ in s if k == 'dimension'}):
+                    conn.execute(f'''
+                        CREATE TABLE IF NOT EXISTS dim_{dimension} (
+                            code INTEGER PRIMARY KEY,
+                            value TEXT UNIQUE NOT NULL
+                        )
+                    ''')
+                for table, schema in COMPACT_SCHEMA.items():
+                    columns = ',\n'.join(f'{column} {declared}' for column, _, declared in schema)
+                    conn.execute(f'''
+                        CREATE TABLE IF NOT EXISTS {table} (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            {columns}
+                        )
+                    ''')
+                for name, target in INDEXES.items():
+                    conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {target}')
+            self.logger.info('Compact database initialized successfully')
+        except Exception as e:
+            self.logger.error(f'Error initializing compact database: {e}')
+
+    def _check_table(self, table: str):
+        if table not in COMPACT_SCHEMA:
+            raise ValueError(f'Unknown table: {table}')
+
+    def _kinds(self, table: str) -> Dict[str, str]:
+        return {'id': 'value', **{column: kind for column, kind, _ in COMPACT_SCHEMA[table]}}
+
+    def _load_categories(self, conn, dimension: str) -> List[str]:
+        # Codes are assigned densely from 0, so a value's code is its position here
+        categories = [value for (value,) in conn.execute(f'SELECT value FROM dim_{dimension} ORDER BY code')]
+        self._categories[dimension] = categories
+        return categories
+
+    def _encode_dimension(self, conn, dimension: str, values: pd.Series) -> List[Optional[int]]:
+        codes, uniques = pd.factorize(values)
+        lookup = {value: code for code, value in enumerate(self._load_categories(conn, dimension))}
+        new_values = [value for value in uniques if value not in lookup]
+        if new_values:
+            start = len(lookup)
+            conn.executemany(f'INSERT INTO dim_{dimension} (code, value) VALUES (?, ?)',
+                             [(start + i, value) for i, value in enumerate(new_values)])
+            lookup.update({value: start + i for i, value in enumerate(new_values)})
+            self._categories[dimension].extend(new_values)
+        mapped = np.array([lookup[value] for value in uniques] + [None], dtype=object)
+        return mapped[codes].tolist()
+
+    def _encode(self, conn, table: str, chunk: pd.DataFrame):
+        kinds = self._kinds(table)
+        columns = [c for c in chunk.columns if c in kinds and c != 'id']
+        ignored = [c for c in chunk.columns if c not in kinds]
+        if ignored:
+            self.logger.warning(f'Ignoring columns not in {table}: {ignored}')
+
+        encoded = []
+        for column in columns:
+            kind = kinds[column]
+            if kind == 'day':
+                days = pd.to_datetime(chunk[column]).values.astype('datetime64[D]')
+                encoded.append(np.where(np.isnat(days), None, days.astype(np.int64)).tolist())
+            elif kind == 'month':
+                months = to_month(chunk[column])
+                encoded.append(np.where(np.isnat(months), None, months.astype(np.int64)).tolist())
+            elif kind == 'dimension':
+                encoded.append(self._encode_dimension(conn, column, chunk[column]))
+            else:
+                encoded.append(chunk[column].tolist())
+        return columns, zip(*encoded)
+
+    def write_table(self, table: str, data: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+                    batch_size: int = 50000) -> Dict[str, float]:
+        self._check_table(table)
+        chunks = [data] if isinstance(data, pd.DataFrame) else data
+        rows = 0
+        started = time.perf_counter()
+        try:
+            for chunk in chunks:
+                for start in range(0, len(chunk), batch_size):
+                    batch = chunk.iloc[start:start + batch_size]
+                    # Lookup rows and facts commit together, so codes never dangle
+                    with self.pool.writer() as conn:
+                        columns, records = self._encode(conn, table, batch)
+                        conn.executemany(
+                            f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+                            records
+                        )
+                    rows += len(batch)
+        except Exception as e:
+            self.logger.error(f'Error inserting {table} data: {e}')
+
+        seconds = time.perf_counter() - started
+        rows_per_sec = rows / seconds if seconds > 0 else 0.0
+        self.logger.info(f'Inserted {rows} {table} records ({rows_per_sec:,.0f} rows/sec)')
+        return {'rows': rows, 'seconds': seconds, 'rows_per_sec': rows_per_sec}
+
+    def _build_select(self, conn, table: str, columns: Optional[List[str]] = None, start_date=None,
+                      end_date=None, filters: Optional[Dict[str, Optional[List[str]]]] = None):
+        self._check_table(table)
+        kinds = self._kinds(table)
+        if columns:
+            unknown = [c for c in columns if c not in kinds]
+            if unknown:
+                raise ValueError(f'Unknown columns for {table}: {unknown}')
+        projection = ', '.join(columns or kinds)
+
+        clauses = []
+        params = []
+        date_column = DATE_COLUMNS[table]
+        if kinds[date_column] == 'month':
+            if start_date is not None:
+                clauses.append(f'{date_column} >= ?')
+                params.append(int(np.datetime64(pd.Timestamp(start_date), 'M').astype(np.int64)))
+            if end_date is not None:
+                clauses.append(f'{date_column} <= ?')
+                params.append(int(np.datetime64(pd.Timestamp(end_date), 'M').astype(np.int64)))
+        else:
+            if start_date is not None:
+                clauses.append(f'{date_column} >= ?')
+                params.append(int(np.datetime64(pd.Timestamp(start_date), 'D').astype(np.int64)))
+            if end_date is not None:
+                clauses.append(f'{date_column} <= ?')
+                params.append(int(np.datetime64(pd.Timestamp(end_date), 'D').astype(np.int64)))
+
+        for column, values in (filters or {}).items():
+            if values is None:
+                continue
+            if column not in kinds:
+                raise ValueError(f'Unknown filter column for {table}: {column}')
+            values = list(values)
+            if kinds[column] == 'dimension':
+                lookup = {value: code for code, value in enumerate(self._load_categories(conn, column))}
+                values = [lookup[value] for value in values if value in lookup]
+            clauses.append(f'{column} IN ({", ".join("?" * len(values))})')
+            params.extend(values)
+
+        where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+        return f'SELECT {projection} FROM {table}{where}', params
+
+    def _decode(self, conn, table: str, frame: pd.DataFrame) -> pd.DataFrame:
+        kinds = self._kinds(table)
+        for column in frame.columns:
+            kind = kinds[column]
+            if kind == 'day':
+                frame[column] = pd.to_datetime(frame[column], unit='D')
+            elif kind == 'month':
+                values = frame[column].to_numpy(dtype=float)
+                months = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[M]')
+                present = ~np.isnan(values)
+                months[present] = values[present].astype(np.int64).astype('datetime64[M]')
+                frame[column] = months.astype('datetime64[ns]')
+            elif kind == 'dimension':
+                codes = frame[column].fillna(-1).to_numpy(dtype=np.int64)
+                categories = self._categories.get(column)
+                if categories is None or (len(codes) and codes.max() >= len(categories)):
+                    categories = self._load_categories(conn, column)
+                frame[column] = pd.Categorical.from_codes(codes, categories=categories)
+            elif kind == 'flag':
+                frame[column] = frame[column].astype('boolean' if frame[column].isna().any() else bool)
+        return frame
+
+    def read_table(self, table: str, columns: Optional[List[str]] = None, start_date=None, end_date=None,
+                   filters: Optional[Dict[str, Optional[List[str]]]] = None) -> pd.DataFrame:
+        try:
+            with self.pool.reader() as conn:
+                sql, params = self._build_select(conn, table, columns, start_date, end_date, filters)
+                return self._decode(conn, table, pd.read_sql_query(sql, conn, params=params))
+        except Exception as e:
+            self.logger.error(f'Error retrieving {table} data: {e}')
+            return pd.DataFrame()
+
+    def iter_table(self, table: str, chunksize: int = 100000, columns: Optional[List[str]] = None,
+                   start_date=None, end_date=None,
+                   filters: Optional[Dict[str, Optional[List[str]]]] = None) -> Iterator[pd.DataFrame]:
+        try:
+            with self.pool.reader() as conn:
+                sql, params = self._build_select(conn, table, columns, start_date, end_date, filters)
+                for chunk in pd.read_sql_query(sql, conn, params=params, chunksize=chunksize):
+                    yield self._decode(conn, table, chunk)
+        except Exception as e:
+            self.logger.error(f'Error streaming {table} data: {e}')
+
+    def close(self):
+        self.pool.close()
+
+
+def load_settings(path: str = SETTINGS_PATH) -> Dict:
+    with open(path, 'rb') as f:
+        raw = f.read()
+    # settings.yaml is saved as UTF-16 on Windows; accept either encoding
+    encoding = 'utf-16' if raw[:2] in (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE) else 'utf-8-sig'
+    return yaml.safe_load(raw.decode(encoding)) or {}
+
+
+def create_backend(settings: Optional[Dict] = None) -> StorageBackend:
+    # Keyed on database.type in config/settings.yaml
+    database = (settings if settings is not None else load_settings()).get('database', {})
+    backend_type = database.get('type', 'sqlite')
+    if backend_type == 'sqlite':
+        return SQLiteBackend(db_path=database.get('path', 'bizmetrics360.db'))
+    if backend_type == 'sqlite_compact':
+        # Its own file: the integer-encoded schema cannot share tables with the standard database
+        return CompactSQLiteBackend(database.get('compact_path', 'bizmetrics360_compact.db'))
+    if backend_type == 'parquet':
+        return ParquetBackend(database.get('parquet_path', os.path.join('data', 'warehouse')))
+    raise ValueError(f'Unknown storage backend: {backend_type}')